@@ -2,10 +2,12 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from database import get_db, User, UserRole
-from google.auth.transport import requests
-from google.oauth2 import id_token
+from database import get_db, WriteSessionLocal, client_key, User, UserRole
+from token_verifier import verifier
+from user_cache import user_cache, snapshot
+from metrics import observe_auth
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -15,6 +17,8 @@ security = HTTPBearer()
 
 async def verify_google_token(token: str) -> dict:
     """Google ID 토큰 검증"""
+    started = time.perf_counter()
+    ok = False
     try:
         GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
         if not GOOGLE_CLIENT_ID:
@@ -23,14 +27,10 @@ async def verify_google_token(token: str) -> dict:
                 detail="GOOGLE_CLIENT_ID not configured"
             )
         
-        idinfo = id_token.verify_oauth2_token(
-            token, requests.Request(), GOOGLE_CLIENT_ID
-        )
-        
-        if idinfo['iss'] not in ['accounts.google.com', 'https://accounts.google.com']:
-            raise ValueError('Wrong issuer.')
-        
-        return idinfo
+        # 공개키 캐시 + 검증 결과 캐시 사용, 서명 검증은 이벤트 루프 밖에서 수행
+        claims = await verifier.verify(token, GOOGLE_CLIENT_ID)
+        ok = True
+        return claims
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -41,6 +41,8 @@ async def verify_google_token(token: str) -> dict:
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Token verification failed: {str(e)}"
         )
+    finally:
+        observe_auth(time.perf_counter() - started, ok)
 
 
 async def get_current_user(
@@ -55,28 +57,44 @@ async def get_current_user(
     google_id = google_info.get('sub')
     name = google_info.get('name', email)
     
+    # 캐시 히트 시 DB 조회 생략
+    cached_user = user_cache.get(google_id, email)
+    if cached_user is not None:
+        return cached_user
+    
     # 유저 조회 또는 생성
     result = await db.execute(select(User).where(User.email == email))
     user = result.scalar_one_or_none()
     
-    if not user:
-        # 새 유저 생성 (기본 역할은 teacher)
-        user = User(
-            email=email,
-            name=name,
-            google_id=google_id,
-            role=UserRole.TEACHER.value
-        )
-        db.add(user)
-        await db.commit()
-        await db.refresh(user)
-    elif not user.google_id:
-        # google_id 업데이트
-        user.google_id = google_id
-        await db.commit()
-        await db.refresh(user)
+    if not user or not user.google_id:
+        # 조회 요청의 세션은 읽기 전용(복제본)일 수 있으므로 쓰기 세션에서 다시 조회 후 저장
+        # (SQLite 쓰기 연결은 하나뿐이라 요청 세션이 잡은 연결은 먼저 돌려줌)
+        await db.rollback()
+        async with WriteSessionLocal() as write_db:
+            write_db.info["client_key"] = client_key(token)
+            result = await write_db.execute(select(User).where(User.email == email))
+            user = result.scalar_one_or_none()
+            if not user:
+                # 새 유저 생성 (기본 역할은 teacher)
+                user = User(
+                    email=email,
+                    name=name,
+                    google_id=google_id,
+                    role=UserRole.TEACHER.value
+                )
+                write_db.add(user)
+            elif not user.google_id:
+                # google_id 업데이트
+                user.google_id = google_id
+            await write_db.commit()
+            await write_db.refresh(user)
     
-    return user
+    user_cache.put(user)
+    # 캐시 히트와 같이 세션과 분리된 복사본을 돌려주고 조회에 쓴 연결은 반환
+    # (쓰기 요청의 세션은 SQLite 쓰기 연결이므로 요청이 끝날 때까지 잡고 있지 않도록)
+    detached = snapshot(user)
+    await db.rollback()
+    return detached
 
 
 async def require_role(required_role: UserRole, current_user: User = Depends(get_current_user)) -> User:
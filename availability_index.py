@@ -0,0 +1,317 @@
+import logging
+import os
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal, User, Schedule, UserRole
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 겹침 확인 시 horizon 이전에 시작한 슬롯(인덱스 밖)이 겹칠 수 있는 최대 길이
+MAX_SLOT_SPAN = timedelta(days=1)
+
+
+class SlotSnapshot(NamedTuple):
+    start_time: datetime
+    end_time: datetime
+    id: int
+    is_available: bool
+    created_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def from_schedule(cls, schedule: Schedule) -> "SlotSnapshot":
+        return cls(
+            schedule.start_time,
+            schedule.end_time,
+            schedule.id,
+            bool(schedule.is_available),
+            schedule.created_at,
+            schedule.updated_at,
+        )
+
+
+class TeacherSlots:
+    """선생 한 명의 슬롯 (시작 시간 순 정렬 배열)"""
+
+    __slots__ = ("name", "slots", "max_duration")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.slots: List[SlotSnapshot] = []
+        self.max_duration = timedelta(0)
+
+    def add(self, slot: SlotSnapshot):
+        insort(self.slots, slot)
+        self.max_duration = max(self.max_duration, slot.end_time - slot.start_time)
+
+    def remove(self, schedule_id: int) -> Optional[SlotSnapshot]:
+        for position, slot in enumerate(self.slots):
+            if slot.id == schedule_id:
+                return self.slots.pop(position)
+        return None
+
+    def _first_starting_at(self, start_time: datetime) -> int:
+        return bisect_left(self.slots, (start_time,))
+
+    def open_slots(
+        self,
+        start_time: datetime,
+        end_time: Optional[datetime],
+        min_duration: Optional[timedelta]
+    ) -> List[SlotSnapshot]:
+        """start_time 이후 시작하고 end_time 전에 끝나는 배정 가능 슬롯"""
+        result = []
+        for position in range(self._first_starting_at(start_time), len(self.slots)):
+            slot = self.slots[position]
+            if end_time and slot.start_time >= end_time:
+                break
+            if not slot.is_available:
+                continue
+            if end_time and slot.end_time > end_time:
+                continue
+            if min_duration and slot.end_time - slot.start_time < min_duration:
+                continue
+            result.append(slot)
+        return result
+
+    def overlapping(self, start_time: datetime, end_time: datetime) -> List[int]:
+        """[start_time, end_time)과 겹치는 슬롯 ID (배정 여부 무관)"""
+        position = self._first_starting_at(end_time)
+        earliest_start = start_time - self.max_duration
+        result = []
+        while position > 0:
+            position -= 1
+            slot = self.slots[position]
+            if slot.start_time <= earliest_start:
+                break
+            if slot.end_time > start_time:
+                result.append(slot.id)
+        return result
+
+
+class AvailabilityIndex:
+    """선생별 슬롯의 프로세스 내 인덱스
+
+    horizon 이후에 시작하는 모든 슬롯(배정 가능 여부 포함)을 보관한다.
+    인덱스가 비어 있거나(cold) 조회 범위가 horizon 이전이면 None을 돌려주고,
+    호출자는 SQL로 조회한다.
+    """
+
+    def __init__(self, lookback_days: int = 0):
+        self.lookback_days = lookback_days
+        self.ready = False
+        self.horizon: Optional[datetime] = None
+        self._teachers: Dict[int, TeacherSlots] = {}
+        self._teacher_ids: List[int] = []
+        self._slot_teacher: Dict[int, int] = {}
+
+    # --- 적재 ---
+
+    async def load(self, db: Optional[AsyncSession] = None):
+        """DB에서 전체 적재 (앱 시작 시)"""
+        if db is None:
+            async with AsyncSessionLocal() as session:
+                return await self.load(session)
+
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        horizon = today - timedelta(days=self.lookback_days)
+        result = await db.execute(self._slots_query(horizon))
+
+        teachers: Dict[int, TeacherSlots] = {}
+        slot_teacher: Dict[int, int] = {}
+        for teacher_id, teacher_name, *columns in result.all():
+            slot = SlotSnapshot(*columns)
+            teachers.setdefault(teacher_id, TeacherSlots(teacher_name)).add(slot)
+            slot_teacher[slot.id] = teacher_id
+
+        self._teachers = teachers
+        self._teacher_ids = sorted(teachers)
+        self._slot_teacher = slot_teacher
+        self.horizon = horizon
+        self.ready = True
+        logger.info("Availability index loaded: %d teachers, %d slots", len(teachers), len(slot_teacher))
+
+    def _slots_query(self, horizon: datetime, teacher_id: Optional[int] = None):
+        query = (
+            select(
+                User.id,
+                User.name,
+                Schedule.start_time,
+                Schedule.end_time,
+                Schedule.id,
+                Schedule.is_available,
+                Schedule.created_at,
+                Schedule.updated_at,
+            )
+            .join(Schedule, Schedule.teacher_id == User.id)
+            .where(User.role == UserRole.TEACHER.value, Schedule.start_time >= horizon)
+        )
+        if teacher_id is not None:
+            query = query.where(User.id == teacher_id)
+        return query
+
+    async def load_teacher(self, db: AsyncSession, teacher_id: int):
+        """선생 한 명 다시 적재 (역할 변경 등)"""
+        if not self.ready:
+            return
+        self.remove_teacher(teacher_id)
+        result = await db.execute(self._slots_query(self.horizon, teacher_id))
+        for _, teacher_name, *columns in result.all():
+            self._add(teacher_id, teacher_name, SlotSnapshot(*columns))
+
+    async def refresh_teacher(self, teacher_id: int):
+        """다른 워커에서 바뀐 선생(역할 변경 등)을 DB에서 다시 적재"""
+        async with AsyncSessionLocal() as session:
+            await self.load_teacher(session, teacher_id)
+
+    async def refresh_schedules(self, schedule_ids: Iterable[int]):
+        """다른 워커에서 바뀐 스케줄을 DB에서 다시 읽어 반영 (없어졌으면 제거)"""
+        if not self.ready:
+            return
+        schedule_ids = set(schedule_ids)
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                self._slots_query(self.horizon).where(Schedule.id.in_(schedule_ids))
+            )
+            rows = result.all()
+        for teacher_id, teacher_name, *columns in rows:
+            slot = SlotSnapshot(*columns)
+            self.remove(slot.id)
+            self._add(teacher_id, teacher_name, slot)
+            schedule_ids.discard(slot.id)
+        for schedule_id in schedule_ids:
+            self.remove(schedule_id)
+
+    def clear(self):
+        self.ready = False
+        self.horizon = None
+        self._teachers = {}
+        self._teacher_ids = []
+        self._slot_teacher = {}
+
+    # --- 변경 반영 (커밋 후 호출) ---
+
+    def _add(self, teacher_id: int, teacher_name: str, slot: SlotSnapshot):
+        teacher = self._teachers.get(teacher_id)
+        if teacher is None:
+            teacher = self._teachers[teacher_id] = TeacherSlots(teacher_name)
+            insort(self._teacher_ids, teacher_id)
+        teacher.add(slot)
+        self._slot_teacher[slot.id] = teacher_id
+
+    def upsert(self, schedule: Schedule, teacher_name: Optional[str] = None):
+        """스케줄 생성/변경 반영"""
+        if not self.ready or schedule.start_time < self.horizon:
+            return
+        teacher = self._teachers.get(schedule.teacher_id)
+        if teacher is None and teacher_name is None:
+            # 인덱스에 없는 선생(역할이 바뀐 선생 등)은 인덱스 대상이 아니므로 건너뜀
+            logger.debug("Availability index skipping unknown teacher %s", schedule.teacher_id)
+            return
+        self.remove(schedule.id)
+        self._add(schedule.teacher_id, teacher_name or teacher.name, SlotSnapshot.from_schedule(schedule))
+
+    def upsert_many(self, schedules: Iterable[Schedule], teacher_name: Optional[str] = None):
+        for schedule in schedules:
+            self.upsert(schedule, teacher_name)
+
+    def remove(self, schedule_id: int):
+        """스케줄 삭제 반영"""
+        teacher_id = self._slot_teacher.pop(schedule_id, None)
+        if teacher_id is None:
+            return
+        teacher = self._teachers[teacher_id]
+        teacher.remove(schedule_id)
+        if not teacher.slots:
+            self.remove_teacher(teacher_id)
+
+    def remove_teacher(self, teacher_id: int):
+        teacher = self._teachers.pop(teacher_id, None)
+        if teacher is None:
+            return
+        self._teacher_ids.remove(teacher_id)
+        for slot in teacher.slots:
+            self._slot_teacher.pop(slot.id, None)
+
+    # --- 조회 ---
+
+    def covers(self, start_time: Optional[datetime]) -> bool:
+        return self.ready and start_time is not None and start_time >= self.horizon
+
+    def find_available(
+        self,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        teacher_ids: Optional[List[int]] = None,
+        min_duration: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> Optional[List[Tuple[int, str, List[SlotSnapshot]]]]:
+        """배정 가능한 슬롯 조회 (선생 ID 순), 인덱스로 답할 수 없으면 None"""
+        if not self.covers(start_time):
+            return None
+        duration = timedelta(minutes=min_duration) if min_duration else None
+        candidate_ids = sorted(set(teacher_ids)) if teacher_ids else self._teacher_ids
+
+        result = []
+        for teacher_id in candidate_ids:
+            teacher = self._teachers.get(teacher_id)
+            if teacher is None:
+                continue
+            slots = teacher.open_slots(start_time, end_time, duration)
+            if slots:
+                result.append((teacher_id, teacher.name, slots))
+                if limit and len(result) >= limit:
+                    break
+        return result
+
+    def find_overlaps(self, teacher_id: int, start_time: datetime, end_time: datetime) -> Optional[List[int]]:
+        """선생의 기존 슬롯 중 겹치는 것, 인덱스로 답할 수 없으면 None"""
+        # 인덱스 밖(horizon 이전 시작) 슬롯이 겹칠 수 있으면 SQL로 확인
+        if not self.ready or start_time - MAX_SLOT_SPAN < self.horizon:
+            return None
+        teacher = self._teachers.get(teacher_id)
+        return teacher.overlapping(start_time, end_time) if teacher else []
+
+    # --- 검증 ---
+
+    async def check(self, db: AsyncSession) -> dict:
+        """DB와 비교해서 차이 보고"""
+        if not self.ready:
+            return {"ready": False}
+        result = await db.execute(self._slots_query(self.horizon))
+        expected = {}
+        for teacher_id, _, *columns in result.all():
+            slot = SlotSnapshot(*columns)
+            expected[slot.id] = (teacher_id, slot)
+        actual = {
+            slot.id: (teacher_id, slot)
+            for teacher_id, teacher in self._teachers.items()
+            for slot in teacher.slots
+        }
+        return {
+            "ready": True,
+            "horizon": self.horizon,
+            "teachers": len(self._teachers),
+            "slots": len(actual),
+            "missing": sorted(expected.keys() - actual.keys()),
+            "extra": sorted(actual.keys() - expected.keys()),
+            "mismatched": sorted(
+                schedule_id for schedule_id in expected.keys() & actual.keys()
+                if expected[schedule_id] != actual[schedule_id]
+            ),
+        }
+
+
+availability_index = AvailabilityIndex(
+    lookback_days=int(os.getenv("AVAILABILITY_INDEX_LOOKBACK_DAYS", "0"))
+)
+
+
+def availability_index_enabled() -> bool:
+    return os.getenv("AVAILABILITY_INDEX_ENABLED", "true").lower() == "true"
@@ -0,0 +1,5 @@
+"""벤치마크 도구 (운영 이미지에는 포함하지 않음)
+
+    python -m benchmarks.datagen    합성 데이터 대량 적재
+    python -m benchmarks.loadtest   ASGI 앱 부하 테스트 (지연 분위수, 쿼리 수, JSON 결과)
+"""
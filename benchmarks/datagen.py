@@ -0,0 +1,169 @@
+"""벤치마크용 합성 데이터 생성 (시드 고정, 대량 INSERT)
+
+DATABASE_URL의 빈 DB(SQLite 또는 PostgreSQL)에 선생/데스크 유저, 스케줄, 수업을
+적재하고 월별 집계(teacher_month_rollup)를 다시 계산한다. 같은 시드면 같은 데이터가
+만들어지므로 실행 결과를 서로 비교할 수 있다.
+
+    python -m benchmarks.datagen --teachers 300 --days 180
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Iterator, List
+from sqlalchemy import func, insert, select, text
+from database import write_engine, WriteSessionLocal, User, Schedule, Class, UserRole, AssignmentStatus
+from migrations import upgrade
+from rollup import rebuild
+
+logger = logging.getLogger(__name__)
+
+INSERT_CHUNK_SIZE = 5000
+# 하루 슬롯 시작 시각 (2시간 간격이라 최대 길이 120분이면 겹치지 않음)
+SLOT_START_HOURS = (9, 11, 13, 15, 17, 19)
+SLOT_MINUTES = (30, 60, 90, 120)
+
+
+def teacher_email(index: int) -> str:
+    return f"teacher{index}@example.com"
+
+
+def desk_email(index: int) -> str:
+    return f"desk{index}@example.com"
+
+
+def _chunks(rows: List[dict]) -> Iterator[List[dict]]:
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        yield rows[start:start + INSERT_CHUNK_SIZE]
+
+
+def generate(
+    teachers: int,
+    desks: int,
+    days: int,
+    slots_per_day: float,
+    class_ratio: float,
+    seed: int,
+    today: datetime
+):
+    """(users, schedules, classes) 행 목록 생성 (ID 직접 지정)
+
+    기간은 오늘 기준 앞뒤 days/2일. 지난 슬롯의 수업은 대부분 수락, 앞으로의
+    슬롯은 대기가 많다. 수락된 수업의 스케줄은 배정 불가로 표시한다.
+    """
+    rnd = random.Random(seed)
+    users, schedules, classes = [], [], []
+
+    for index in range(desks):
+        email = desk_email(index)
+        users.append({
+            "id": len(users) + 1, "email": email, "name": f"데스크{index}",
+            "role": UserRole.DESK.value, "google_id": email,
+            "created_at": today, "updated_at": today,
+        })
+    desk_ids = [user["id"] for user in users]
+
+    teacher_ids = []
+    for index in range(teachers):
+        email = teacher_email(index)
+        users.append({
+            "id": len(users) + 1, "email": email, "name": f"선생{index}",
+            "role": UserRole.TEACHER.value, "google_id": email,
+            "created_at": today, "updated_at": today,
+        })
+        teacher_ids.append(users[-1]["id"])
+
+    first_day = today - timedelta(days=days // 2)
+    slot_probability = min(slots_per_day / len(SLOT_START_HOURS), 1.0)
+    for teacher_id in teacher_ids:
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            for hour in SLOT_START_HOURS:
+                if rnd.random() >= slot_probability:
+                    continue
+                start_time = day.replace(hour=hour)
+                end_time = start_time + timedelta(minutes=rnd.choice(SLOT_MINUTES))
+                created_at = start_time - timedelta(days=rnd.randint(1, 30), minutes=rnd.randint(0, 1439))
+                schedule = {
+                    "id": len(schedules) + 1, "teacher_id": teacher_id,
+                    "start_time": start_time, "end_time": end_time, "is_available": True,
+                    "created_at": created_at, "updated_at": created_at,
+                }
+                schedules.append(schedule)
+                if rnd.random() >= class_ratio:
+                    continue
+
+                past = start_time < today
+                draw = rnd.random()
+                if draw < (0.7 if past else 0.4):
+                    status = AssignmentStatus.ACCEPTED.value
+                elif draw < (0.8 if past else 0.5):
+                    status = AssignmentStatus.REJECTED.value
+                else:
+                    status = AssignmentStatus.PENDING.value
+                assigned_at = created_at + timedelta(hours=rnd.randint(1, 24))
+                decided_at = assigned_at + timedelta(hours=rnd.randint(1, 48))
+                accepted = status == AssignmentStatus.ACCEPTED.value
+                if accepted:
+                    schedule["is_available"] = False
+                    schedule["updated_at"] = decided_at
+                classes.append({
+                    "id": len(classes) + 1, "student_name": f"학생{rnd.randint(1, 50000)}",
+                    "teacher_id": teacher_id, "schedule_id": schedule["id"], "status": status,
+                    "created_by": rnd.choice(desk_ids) if desk_ids else None,
+                    "created_at": assigned_at,
+                    "updated_at": assigned_at if status == AssignmentStatus.PENDING.value else decided_at,
+                    "accepted_at": decided_at if accepted else None,
+                })
+
+    return users, schedules, classes
+
+
+async def load(users: List[dict], schedules: List[dict], classes: List[dict]):
+    async with write_engine.begin() as conn:
+        existing = await conn.scalar(select(func.count()).select_from(User))
+        if existing:
+            raise SystemExit(f"Database already has {existing} user(s); use an empty database")
+        for model, rows in ((User, users), (Schedule, schedules), (Class, classes)):
+            for chunk in _chunks(rows):
+                await conn.execute(insert(model), chunk)
+            logger.info("Inserted %d %s", len(rows), model.__tablename__)
+        if conn.dialect.name == "postgresql":
+            # ID를 직접 지정했으므로 시퀀스를 맞춰 둠
+            for model in (User, Schedule, Class):
+                table = model.__tablename__
+                await conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {table}), 1))"
+                ))
+
+
+async def main(args) -> int:
+    await upgrade()
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    started = time.perf_counter()
+    users, schedules, classes = generate(
+        args.teachers, args.desks, args.days, args.slots_per_day, args.class_ratio, args.seed, today
+    )
+    await load(users, schedules, classes)
+    async with WriteSessionLocal() as db:
+        rollup_rows = await rebuild(db)
+    print(
+        f"loaded {len(users)} users, {len(schedules)} schedules, {len(classes)} classes, "
+        f"{rollup_rows} rollup rows in {time.perf_counter() - started:.1f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="벤치마크용 합성 데이터 적재")
+    parser.add_argument("--teachers", type=int, default=300)
+    parser.add_argument("--desks", type=int, default=10)
+    parser.add_argument("--days", type=int, default=180, help="오늘 기준 앞뒤로 나눈 기간 (일)")
+    parser.add_argument("--slots-per-day", type=float, default=3.0, help="선생 1명의 하루 평균 슬롯 수 (최대 6)")
+    parser.add_argument("--class-ratio", type=float, default=0.6, help="수업이 배정된 슬롯 비율")
+    parser.add_argument("--seed", type=int, default=42)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,390 @@
+"""API 부하 테스트 (ASGI 앱에 직접 요청)
+
+datagen으로 적재한 DB를 대상으로 선생/데스크 트래픽을 섞어서 보내고, 엔드포인트별
+처리량, 지연 시간 분위수(p50/p95/p99), 요청당 SQL 쿼리 수를 보고한다. 앱은 같은
+프로세스에서 ASGI로 직접 호출하므로 네트워크/서버 오버헤드는 포함되지 않는다.
+
+    python -m benchmarks.loadtest --requests 5000 --concurrency 32 --output run.json
+    python -m benchmarks.loadtest --baseline run.json    # 이전 결과와 비교
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import random
+import subprocess
+import time
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+import httpx
+from sqlalchemy import event, select, exists
+from database import engine, write_engine, replica_engine, AsyncSessionLocal, User, Schedule, Class, UserRole, AssignmentStatus
+from benchmarks.tokens import LocalTokenIssuer
+
+logger = logging.getLogger(__name__)
+
+# 요청 하나가 실행한 SQL 수 (요청마다 새 카운터를 설정)
+_query_counter: ContextVar[Optional[List[int]]] = ContextVar("bench_query_counter", default=None)
+# 쓰기 시나리오에 쓸 ID를 미리 읽어 두는 최대 개수
+FIXTURE_POOL_SIZE = 5000
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _query_counter.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def install_query_counter():
+    engines = {id(bound.sync_engine): bound.sync_engine for bound in (engine, write_engine, replica_engine) if bound is not None}
+    for sync_engine in engines.values():
+        event.listen(sync_engine, "before_cursor_execute", _count_query)
+
+
+class Fixture:
+    """시나리오에 쓸 유저/스케줄/수업 (시작 시 DB에서 읽음)"""
+
+    def __init__(self, teachers: List[Tuple[int, str]], desks: List[str], open_schedule_ids: List[int], pending_classes: List[Tuple[int, str]]):
+        self.teachers = teachers
+        self.desks = desks
+        self.open_schedule_ids = open_schedule_ids
+        self.pending_classes = pending_classes
+
+    @classmethod
+    async def load(cls, seed: int) -> "Fixture":
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            teachers = (await db.execute(
+                select(User.id, User.email).where(User.role == UserRole.TEACHER.value).order_by(User.id)
+            )).all()
+            desks = (await db.execute(
+                select(User.email).where(User.role == UserRole.DESK.value).order_by(User.id)
+            )).scalars().all()
+            open_schedule_ids = (await db.execute(
+                select(Schedule.id)
+                .where(
+                    Schedule.is_available == True,
+                    Schedule.start_time >= now,
+                    ~exists().where(Class.schedule_id == Schedule.id)
+                )
+                .order_by(Schedule.id)
+                .limit(FIXTURE_POOL_SIZE)
+            )).scalars().all()
+            pending_classes = (await db.execute(
+                select(Class.id, User.email)
+                .join(User, Class.teacher_id == User.id)
+                .where(Class.status == AssignmentStatus.PENDING.value)
+                .order_by(Class.id)
+                .limit(FIXTURE_POOL_SIZE)
+            )).all()
+        if not teachers or not desks:
+            raise SystemExit("No teacher/desk users found; run `python -m benchmarks.datagen` first")
+        rnd = random.Random(seed)
+        open_schedule_ids = list(open_schedule_ids)
+        pending_classes = [tuple(row) for row in pending_classes]
+        rnd.shuffle(open_schedule_ids)
+        rnd.shuffle(pending_classes)
+        return cls([tuple(row) for row in teachers], list(desks), open_schedule_ids, pending_classes)
+
+
+class Scenario(NamedTuple):
+    label: str
+    weight: int
+    write: bool
+    # (드라이버, 난수) -> 요청 코루틴, 보낼 수 없으면(ID 소진 등) None
+    build: Callable[["LoadDriver", random.Random], Optional[Awaitable[httpx.Response]]]
+
+
+def _day(rnd: random.Random) -> datetime:
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    return today + timedelta(days=rnd.randint(-30, 30))
+
+
+def _month_window(day: datetime) -> Tuple[str, str]:
+    start = day.replace(day=1)
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start.isoformat(), end.isoformat()
+
+
+def _teacher_schedules(driver: "LoadDriver", rnd: random.Random):
+    start, end = _month_window(_day(rnd))
+    return driver.get(driver.teacher(rnd), "/api/teacher/schedules", {"from": start, "to": end})
+
+
+def _teacher_calendar(driver: "LoadDriver", rnd: random.Random):
+    day = _day(rnd)
+    return driver.get(driver.teacher(rnd), "/api/teacher/schedules/calendar", {
+        "from": day.isoformat(), "to": (day + timedelta(days=7)).isoformat()
+    })
+
+
+def _teacher_classes(driver: "LoadDriver", rnd: random.Random):
+    return driver.get(driver.teacher(rnd), "/api/teacher/classes", {"limit": 50})
+
+
+def _teacher_pending(driver: "LoadDriver", rnd: random.Random):
+    return driver.get(driver.teacher(rnd), "/api/teacher/classes/pending")
+
+
+def _teacher_worktime(driver: "LoadDriver", rnd: random.Random):
+    day = _day(rnd)
+    return driver.get(driver.teacher(rnd), "/api/teacher/worktime", {"year": day.year, "month": day.month})
+
+
+def _teacher_create_schedule(driver: "LoadDriver", rnd: random.Random):
+    # datagen 슬롯 격자(9~21시) 밖 시간이라 대부분 겹치지 않음
+    start = _day(rnd).replace(hour=rnd.choice((7, 21)), minute=rnd.choice((0, 30)))
+    return driver.post(driver.teacher(rnd), "/api/teacher/schedules", {
+        "start_time": start.isoformat(), "end_time": (start + timedelta(minutes=30)).isoformat()
+    })
+
+
+def _teacher_accept(driver: "LoadDriver", rnd: random.Random):
+    if not driver.fixture.pending_classes:
+        return None
+    class_id, email = driver.fixture.pending_classes.pop()
+    return driver.post(email, f"/api/teacher/classes/{class_id}/accept", {"accept": rnd.random() < 0.8})
+
+
+def _desk_available(driver: "LoadDriver", rnd: random.Random):
+    day = _day(rnd)
+    return driver.get(driver.desk(rnd), "/api/desk/teachers/available", {
+        "start_time": day.isoformat(), "end_time": (day + timedelta(days=7)).isoformat()
+    })
+
+
+def _desk_worktime(driver: "LoadDriver", rnd: random.Random):
+    day = _day(rnd)
+    return driver.get(driver.desk(rnd), "/api/desk/teachers/schedules", {
+        "year": day.year, "month": day.month, "include_schedules": str(rnd.random() < 0.3).lower()
+    })
+
+
+def _desk_classes(driver: "LoadDriver", rnd: random.Random):
+    params = {"limit": 100}
+    if rnd.random() < 0.5:
+        params["status_filter"] = AssignmentStatus.PENDING.value
+    return driver.get(driver.desk(rnd), "/api/desk/classes", params)
+
+
+def _desk_assign(driver: "LoadDriver", rnd: random.Random):
+    if not driver.fixture.open_schedule_ids:
+        return None
+    schedule_id = driver.fixture.open_schedule_ids.pop()
+    return driver.post(driver.desk(rnd), "/api/desk/classes", {
+        "student_name": f"부하{rnd.randint(1, 99999)}", "schedule_id": schedule_id
+    })
+
+
+SCENARIOS = [
+    Scenario("GET /api/teacher/schedules", 15, False, _teacher_schedules),
+    Scenario("GET /api/teacher/schedules/calendar", 15, False, _teacher_calendar),
+    Scenario("GET /api/teacher/classes", 10, False, _teacher_classes),
+    Scenario("GET /api/teacher/classes/pending", 5, False, _teacher_pending),
+    Scenario("GET /api/teacher/worktime", 5, False, _teacher_worktime),
+    Scenario("POST /api/teacher/schedules", 2, True, _teacher_create_schedule),
+    Scenario("POST /api/teacher/classes/{id}/accept", 2, True, _teacher_accept),
+    Scenario("GET /api/desk/teachers/available", 15, False, _desk_available),
+    Scenario("GET /api/desk/teachers/schedules", 8, False, _desk_worktime),
+    Scenario("GET /api/desk/classes", 8, False, _desk_classes),
+    Scenario("POST /api/desk/classes", 3, True, _desk_assign),
+]
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """nearest-rank 분위수"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(q / 100 * len(sorted_values)) - 1)]
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.queries: List[int] = []
+        self.statuses: Dict[str, int] = {}
+
+    def add(self, seconds: float, queries: int, status: Optional[int]):
+        self.latencies.append(seconds)
+        self.queries.append(queries)
+        key = str(status) if status is not None else "exception"
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+
+    def merge(self, other: "EndpointStats"):
+        self.latencies.extend(other.latencies)
+        self.queries.extend(other.queries)
+        for key, count in other.statuses.items():
+            self.statuses[key] = self.statuses.get(key, 0) + count
+
+    def summary(self, elapsed: float) -> dict:
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        errors = sum(n for key, n in self.statuses.items() if key == "exception" or key.startswith("5"))
+        return {
+            "requests": count,
+            "errors": errors,
+            "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+            "mean_queries": round(sum(self.queries) / count, 2) if count else 0.0,
+            "max_queries": max(self.queries, default=0),
+            "statuses": dict(sorted(self.statuses.items())),
+        }
+
+
+class LoadDriver:
+    def __init__(self, client: httpx.AsyncClient, issuer: LocalTokenIssuer, fixture: Fixture, scenarios: List[Scenario]):
+        self.client = client
+        self.issuer = issuer
+        self.fixture = fixture
+        self.scenarios = scenarios
+        self.stats: Dict[str, EndpointStats] = {}
+        self._tokens: Dict[str, str] = {}
+        self._remaining = 0
+
+    def teacher(self, rnd: random.Random) -> str:
+        return rnd.choice(self.fixture.teachers)[1]
+
+    def desk(self, rnd: random.Random) -> str:
+        return rnd.choice(self.fixture.desks)
+
+    def _headers(self, email: str) -> dict:
+        token = self._tokens.get(email)
+        if token is None:
+            token = self._tokens[email] = self.issuer.issue(email)
+        return {"Authorization": f"Bearer {token}"}
+
+    def get(self, email: str, path: str, params: Optional[dict] = None):
+        return self.client.get(path, params=params, headers=self._headers(email))
+
+    def post(self, email: str, path: str, body: dict):
+        return self.client.post(path, json=body, headers=self._headers(email))
+
+    def _pick(self, rnd: random.Random) -> Tuple[str, Awaitable[httpx.Response]]:
+        weights = [scenario.weight for scenario in self.scenarios]
+        while True:
+            scenario = rnd.choices(self.scenarios, weights)[0]
+            request = scenario.build(self, rnd)
+            if request is not None:
+                return scenario.label, request
+
+    async def _worker(self, rnd: random.Random, record: bool):
+        while self._remaining > 0:
+            self._remaining -= 1
+            label, request = self._pick(rnd)
+            counter = [0]
+            token = _query_counter.set(counter)
+            started = time.perf_counter()
+            status = None
+            try:
+                status = (await request).status_code
+            except Exception:
+                logger.exception("Request failed: %s", label)
+            finally:
+                _query_counter.reset(token)
+            if record:
+                self.stats.setdefault(label, EndpointStats()).add(time.perf_counter() - started, counter[0], status)
+
+    async def run(self, requests: int, concurrency: int, seed: int, record: bool = True) -> float:
+        """requests개를 concurrency개 동시 요청으로 보내고 걸린 시간(초) 반환"""
+        self._remaining = requests
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            self._worker(random.Random(seed * 1000 + index), record) for index in range(concurrency)
+        ))
+        return time.perf_counter() - started
+
+    def report(self, elapsed: float) -> dict:
+        total = EndpointStats()
+        for stats in self.stats.values():
+            total.merge(stats)
+        return {
+            "total": total.summary(elapsed),
+            "endpoints": {label: stats.summary(elapsed) for label, stats in sorted(self.stats.items())},
+        }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(result: dict, baseline: Optional[dict] = None):
+    header = f"{'endpoint':<42}{'req':>7}{'err':>5}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}"
+    if baseline:
+        header += f"{'p95 vs base':>14}"
+    print(header)
+    rows = list(result["endpoints"].items()) + [("TOTAL", result["total"])]
+    for label, summary in rows:
+        line = (
+            f"{label:<42}{summary['requests']:>7}{summary['errors']:>5}{summary['throughput_rps']:>9.1f}"
+            f"{summary['p50_ms']:>9.1f}{summary['p95_ms']:>9.1f}{summary['p99_ms']:>9.1f}{summary['mean_queries']:>9.2f}"
+        )
+        if baseline:
+            before = baseline["total"] if label == "TOTAL" else baseline["endpoints"].get(label)
+            if before and before["p95_ms"]:
+                line += f"{(summary['p95_ms'] / before['p95_ms'] - 1) * 100:>+13.1f}%"
+        print(line)
+
+
+async def main(args) -> int:
+    issuer = LocalTokenIssuer()
+    issuer.install()
+    install_query_counter()
+    # 토큰 검증기 교체 후 앱을 불러옴
+    from main import app
+
+    scenarios = [scenario for scenario in SCENARIOS if not (args.read_only and scenario.write)]
+    async with app.router.lifespan_context(app):
+        fixture = await Fixture.load(args.seed)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            driver = LoadDriver(client, issuer, fixture, scenarios)
+            # 캐시/커넥션 풀 준비 (기록하지 않음)
+            await driver.run(args.warmup, args.concurrency, args.seed + 1, record=False)
+            elapsed = await driver.run(args.requests, args.concurrency, args.seed)
+
+    result = {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(),
+            "git_commit": _git_commit(),
+            "database": engine.dialect.name,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "read_only": args.read_only,
+            "elapsed_seconds": round(elapsed, 3),
+        },
+        **driver.report(elapsed),
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    print_report(result, baseline)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(result, file, indent=2, ensure_ascii=False)
+    return 1 if result["total"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description="API 부하 테스트")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--read-only", action="store_true", help="쓰기 요청 제외")
+    parser.add_argument("--output", help="결과 JSON 파일 경로")
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON 파일")
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,66 @@
+"""벤치마크용 로컬 서명 토큰
+
+Google 대신 로컬에서 만든 RSA 키/인증서로 ID 토큰을 서명한다. token_verifier의
+공개키 조회 함수를 이 인증서로 바꾸므로 verify_google_token은 운영과 같은 경로
+(서명 검증, 검증 토큰 캐시)를 그대로 거친다.
+"""
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt
+import token_verifier
+
+DEFAULT_AUDIENCE = "mega-schedule-bench"
+
+
+class LocalTokenIssuer:
+    def __init__(self, audience: Optional[str] = None, key_id: str = "bench"):
+        # verify_google_token은 요청마다 GOOGLE_CLIENT_ID를 읽으므로 없으면 벤치마크 값으로 설정
+        self.audience = audience or os.environ.setdefault("GOOGLE_CLIENT_ID", DEFAULT_AUDIENCE)
+        self.key_id = key_id
+
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "mega-schedule-bench")])
+        now = datetime.utcnow()
+        certificate = (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - timedelta(days=1))
+            .not_valid_after(now + timedelta(days=30))
+            .sign(key, hashes.SHA256())
+        )
+        self.certificate_pem = certificate.public_bytes(serialization.Encoding.PEM).decode()
+        private_pem = key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        ).decode()
+        self._signer = crypt.RSASigner.from_string(private_pem, key_id=key_id)
+
+    async def fetch_certs(self) -> Tuple[Dict[str, str], int]:
+        return {self.key_id: self.certificate_pem}, 3600
+
+    def install(self):
+        """토큰 검증기가 Google 대신 이 인증서를 사용하도록 교체"""
+        token_verifier.set_key_fetcher(self.fetch_certs)
+
+    def issue(self, email: str, name: Optional[str] = None, ttl: int = 3600) -> str:
+        """Google ID 토큰과 같은 클레임의 토큰 (sub는 email)"""
+        issued_at = int(time.time())
+        return jwt.encode(self._signer, {
+            "iss": "https://accounts.google.com",
+            "aud": self.audience,
+            "sub": email,
+            "email": email,
+            "name": name or email,
+            "iat": issued_at,
+            "exp": issued_at + ttl,
+        }).decode()
@@ -0,0 +1,78 @@
+"""낙관적 동시성 제어 (version 컬럼 compare-and-swap)
+
+Schedule/Class는 version 컬럼을 가지고, 모든 UPDATE는 읽은 시점의 version을
+조건으로 건다 (ORM flush는 version_id_col로 자동, 일괄 UPDATE는 명시적으로).
+다른 요청이 먼저 바꿨으면 0행이 갱신되고, 트랜잭션을 롤백한 뒤 처음부터 다시
+읽어서 재시도한다. 정해진 횟수 안에 성공하지 못하면 락을 기다리지 않고 409를 반환한다.
+"""
+import asyncio
+import logging
+import os
+import random
+from typing import Awaitable, Callable, TypeVar
+from fastapi import HTTPException, status
+from sqlalchemy import tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CONFLICT_RETRY_ATTEMPTS = int(os.getenv("CONFLICT_RETRY_ATTEMPTS", "3"))
+# 재시도 전 대기 시간 상한 (초, 시도마다 증가, 지터 적용)
+CONFLICT_RETRY_BACKOFF = float(os.getenv("CONFLICT_RETRY_BACKOFF", "0.01"))
+
+
+class ConcurrencyConflict(Exception):
+    """CAS UPDATE가 기대한 행 수를 갱신하지 못함 (다른 요청이 먼저 변경)"""
+
+
+# IntegrityError: 수락된 수업 유니크 인덱스(uq_classes_schedule_accepted) 위반
+RETRYABLE_ERRORS = (ConcurrencyConflict, StaleDataError, IntegrityError)
+
+
+async def run_with_retry(
+    db: AsyncSession,
+    operation: Callable[[], Awaitable[T]],
+    attempts: int = CONFLICT_RETRY_ATTEMPTS
+) -> T:
+    """operation(읽기 → CAS 쓰기 → 커밋)을 충돌 시 롤백 후 재시도
+
+    operation은 매번 필요한 행을 다시 읽어야 한다. 재시도한 결과 더 이상
+    처리할 수 없는 상태면 operation이 직접 HTTPException을 던진다.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return await operation()
+        except RETRYABLE_ERRORS as error:
+            await db.rollback()
+            if attempt >= attempts:
+                logger.info("Giving up after %d conflicting attempts: %s", attempt, error)
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Concurrent update conflict, please retry"
+                )
+            await asyncio.sleep(random.uniform(0, CONFLICT_RETRY_BACKOFF * attempt))
+
+
+async def update_versioned(db: AsyncSession, model, rows: list, condition, **values):
+    """읽은 (id, version) 그대로인 행만 일괄 UPDATE, 갱신 행 수가 다르면 ConcurrencyConflict
+
+    갱신한 값은 세션에 있는 객체에도 반영된다 (synchronize_session="fetch").
+    """
+    if not rows:
+        return
+    result = await db.execute(
+        update(model)
+        .where(tuple_(model.id, model.version).in_([(row.id, row.version) for row in rows]), condition)
+        .values(version=model.version + 1, **values)
+        .returning(model.id)
+        .execution_options(synchronize_session="fetch")
+    )
+    if len(result.scalars().all()) != len(rows):
+        raise ConcurrencyConflict()
@@ -0,0 +1,87 @@
+"""목록 응답의 조건부 GET (ETag / Last-Modified)
+
+검증자는 응답과 같은 조건의 (행 수, max(updated_at))을 SQL로 계산해서 만든다.
+커버링 인덱스만 읽으므로 목록 조회보다 훨씬 싸고, 클라이언트의 If-None-Match와
+같으면 목록을 조회/직렬화하지 않고 304를 돌려준다.
+
+행 삭제는 max(updated_at)을 바꾸지 않을 수 있어서 행 수로만 드러난다. 그래서
+If-Modified-Since만으로는 304를 판단하지 않는다 (Last-Modified는 참고용).
+
+페이지(limit) 요청은 전체 집계 대신 그 페이지에 들어갈 행의 (id, updated_at)만 읽어서
+검증자를 만든다 (page_validator).
+"""
+import base64
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import NamedTuple, Optional
+from fastapi import Request, Response, status
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# 브라우저가 저장하되 매번 검증 요청을 보내도록 함
+CACHE_CONTROL = "private, no-cache"
+
+
+class ListValidator(NamedTuple):
+    etag: str
+    last_modified: Optional[datetime]
+
+    def apply(self, response: Response):
+        response.headers["ETag"] = self.etag
+        if self.last_modified is not None:
+            response.headers["Last-Modified"] = format_datetime(
+                self.last_modified.replace(tzinfo=timezone.utc), usegmt=True
+            )
+        response.headers["Cache-Control"] = CACHE_CONTROL
+        vary = response.headers.get("Vary")
+        response.headers["Vary"] = f"{vary}, Authorization" if vary else "Authorization"
+
+
+async def list_validator(db: AsyncSession, request: Request, query, updated_at, scope) -> ListValidator:
+    """query(필터만 적용한 select)와 같은 조건의 행 수/최종 수정 시각으로 검증자 생성
+
+    scope는 같은 URL이라도 사용자별로 결과가 다른 경우 구분하는 값 (선생 ID 등).
+    """
+    validator_query = query.with_only_columns(
+        func.count(), func.max(updated_at), maintain_column_froms=True
+    ).order_by(None)
+    count, last_modified = (await db.execute(validator_query)).one()
+    return _make_validator(request, scope, f"{count}|{_isoformat(last_modified)}", last_modified)
+
+
+async def page_validator(db: AsyncSession, request: Request, page_query, key, updated_at, scope) -> ListValidator:
+    """page_query(정렬/커서/limit까지 적용한 select)가 돌려줄 행의 (key, updated_at)으로 검증자 생성
+
+    페이지 밖의 행은 읽지 않으므로 목록 전체 크기와 관계없이 비용이 페이지 크기만큼이다.
+    """
+    validator_query = page_query.with_only_columns(key, updated_at, maintain_column_froms=True)
+    rows = (await db.execute(validator_query)).all()
+    last_modified = max((row[1] for row in rows if row[1] is not None), default=None)
+    state = ",".join(f"{row[0]}:{_isoformat(row[1])}" for row in rows)
+    return _make_validator(request, scope, state, last_modified)
+
+
+def _isoformat(value: Optional[datetime]) -> str:
+    return value.isoformat() if value else ""
+
+
+def _make_validator(request: Request, scope, state: str, last_modified: Optional[datetime]) -> ListValidator:
+    params = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    raw = f"{request.url.path}?{params}|{scope}|{state}"
+    digest = base64.urlsafe_b64encode(hashlib.sha1(raw.encode()).digest()[:12]).decode()
+    return ListValidator(f'W/"{digest}"', last_modified)
+
+
+def is_not_modified(request: Request, validator: ListValidator) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or validator.etag.removeprefix("W/") in tags
+
+
+def not_modified_response(validator: ListValidator) -> Response:
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    validator.apply(response)
+    return response
@@ -1,31 +1,262 @@
+from fastapi import Request
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import declarative_base
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Float, Enum
+from sqlalchemy.orm import Session, declarative_base
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Float, Enum, Index, text, exc, event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from collections import OrderedDict
 from datetime import datetime
+from typing import Optional
+from uuid import uuid4
 import enum
+import hashlib
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
 # Database setup
 # Supabase PostgreSQL 또는 로컬 SQLite 선택
-DATABASE_URL = os.getenv("DATABASE_URL")
-
-# DATABASE_URL이 없거나 sqlite를 명시한 경우 SQLite 사용
-if not DATABASE_URL or DATABASE_URL.startswith("sqlite"):
-    DATABASE_URL = DATABASE_URL or "sqlite+aiosqlite:///./mega_schedule.db"
-else:
+def normalize_database_url(url: str) -> str:
     # Supabase PostgreSQL URL 형식 변환 (postgres:// -> postgresql+asyncpg://)
-    if DATABASE_URL.startswith("postgres://"):
-        DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql+asyncpg://", 1)
-    elif DATABASE_URL.startswith("postgresql://") and "+asyncpg" not in DATABASE_URL:
-        DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgresql://") and "+asyncpg" not in url:
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
+
+# DATABASE_URL이 없으면 SQLite 사용
+DATABASE_URL = normalize_database_url(
+    os.getenv("DATABASE_URL") or "sqlite+aiosqlite:///./mega_schedule.db"
+)
+
+# 조회 요청용 읽기 복제본 (선택)
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+if DATABASE_REPLICA_URL:
+    DATABASE_REPLICA_URL = normalize_database_url(DATABASE_REPLICA_URL)
 
 # echo=True는 개발 환경에서만, 프로덕션에서는 False
 echo = os.getenv("DB_ECHO", "False").lower() == "true"
-engine = create_async_engine(DATABASE_URL, echo=echo)
+
+# 트랜잭션 모드 pgbouncer/Supabase pooler(6543) 뒤에서 실행
+# prepared statement 캐시를 끄고 이름이 겹치지 않게 하며, 기본으로 풀링은 pgbouncer에 맡김
+PGBOUNCER_MODE = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+
+
+class PoolMetrics:
+    """커넥션 풀 대기 시간 통계 (프로세스 단위)"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.peak_checked_out = 0
+
+    def record(self, waited: float, checked_out: int):
+        self.checkouts += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def snapshot(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+            "peak_checked_out": self.peak_checked_out,
+        }
+
+
+class _TimedCheckout:
+    """풀에서 커넥션을 얻기까지 걸린 시간 기록 (새 연결 생성 시간 포함)"""
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        checked_out = self.checkedout() if isinstance(self, QueuePool) else 0
+        self.metrics.record(time.perf_counter() - started, checked_out)
+        return connection
+
+
+def instrumented_pool(poolclass, metrics: PoolMetrics):
+    # dispose() 후 풀을 다시 만들 때도 같은 통계를 쓰도록 클래스 속성으로 연결
+    return type(f"Instrumented{poolclass.__name__}", (_TimedCheckout, poolclass), {"metrics": metrics})
+
+
+def engine_options(url: str, metrics: PoolMetrics) -> dict:
+    """환경 변수 기반 엔진/풀 설정"""
+    options = {"echo": echo}
+    if url.startswith("sqlite"):
+        options["poolclass"] = instrumented_pool(AsyncAdaptedQueuePool, metrics)
+        return options
+
+    # pgbouncer 모드는 기본으로 클라이언트 풀을 쓰지 않음 (DB_POOL_SIZE로 변경 가능)
+    pool_size = int(os.getenv("DB_POOL_SIZE", "0" if PGBOUNCER_MODE else "5"))
+    if pool_size > 0:
+        options.update(
+            poolclass=instrumented_pool(AsyncAdaptedQueuePool, metrics),
+            pool_size=pool_size,
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "-1")),
+            pool_pre_ping=os.getenv("DB_POOL_PRE_PING", "false").lower() == "true",
+        )
+    else:
+        options["poolclass"] = instrumented_pool(NullPool, metrics)
+
+    if PGBOUNCER_MODE:
+        # 서버 커넥션이 트랜잭션마다 바뀌므로 prepared statement를 재사용하지 않음
+        options["connect_args"] = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+    else:
+        statement_cache_size = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+        options["connect_args"] = {
+            "statement_cache_size": statement_cache_size,
+            "prepared_statement_cache_size": statement_cache_size,
+        }
+    return options
+
+
+def pool_stats(engine) -> dict:
+    """풀 상태 (사용 중/대기/overflow) + 대기 시간 통계"""
+    pool = engine.pool
+    stats = {"pool": type(pool).__bases__[-1].__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+        )
+    stats.update(pool.metrics.snapshot())
+    return stats
+
+
+primary_pool_metrics = PoolMetrics()
+engine = create_async_engine(DATABASE_URL, **engine_options(DATABASE_URL, primary_pool_metrics))
 AsyncSessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+# SQLite 운영 모드: 모든 연결에 WAL 등 PRAGMA 적용, 쓰기는 프로세스당 연결 하나로 직렬화
+SQLITE_MODE = DATABASE_URL.startswith("sqlite")
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000")),  # ms
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),  # bytes
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # 음수는 KiB 단위
+}
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def _disable_driver_begin(dbapi_connection, connection_record):
+    # 드라이버가 BEGIN을 늦게(첫 쓰기 시점에) 보내지 않도록 직접 제어
+    dbapi_connection.isolation_level = None
+
+
+def _begin_immediate(conn):
+    # 트랜잭션 시작 시 쓰기 락을 먼저 잡아, 다른 프로세스와 경합하면 busy_timeout 동안 대기
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+writer_pool_metrics = PoolMetrics()
+if SQLITE_MODE:
+    event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    # 쓰기 전용 엔진: 연결 하나짜리 풀이 쓰기 요청의 대기열 역할 (커밋끼리 경합하지 않음)
+    write_engine = create_async_engine(
+        DATABASE_URL,
+        echo=echo,
+        poolclass=instrumented_pool(AsyncAdaptedQueuePool, writer_pool_metrics),
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=float(os.getenv("SQLITE_WRITE_TIMEOUT", "30")),
+    )
+    event.listen(write_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    event.listen(write_engine.sync_engine, "connect", _disable_driver_begin)
+    event.listen(write_engine.sync_engine, "begin", _begin_immediate)
+else:
+    write_engine = engine
+WriteSessionLocal = async_sessionmaker(write_engine, class_=AsyncSession, expire_on_commit=False)
+
+replica_pool_metrics = PoolMetrics()
+if DATABASE_REPLICA_URL:
+    replica_engine = create_async_engine(
+        DATABASE_REPLICA_URL, **engine_options(DATABASE_REPLICA_URL, replica_pool_metrics)
+    )
+    if DATABASE_REPLICA_URL.startswith("sqlite"):
+        event.listen(replica_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    ReplicaSessionLocal = async_sessionmaker(replica_engine, class_=AsyncSession, expire_on_commit=False)
+else:
+    replica_engine = None
+    ReplicaSessionLocal = None
+
+# 이 메서드의 요청만 읽기 세션 사용
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class RecentWriters:
+    """쓰기 직후 일정 시간 동안 primary에서 읽을 클라이언트 (프로세스 단위)
+
+    클라이언트는 인증 토큰의 해시로 구분한다. 모든 항목의 유지 시간이 같으므로
+    삽입 순서가 곧 만료 순서이다.
+    """
+
+    def __init__(self, window: float, maxsize: int = 10000):
+        self.window = window
+        self.maxsize = maxsize
+        self._until: "OrderedDict[bytes, float]" = OrderedDict()
+
+    def mark(self, key: bytes):
+        now = time.monotonic()
+        self._until.pop(key, None)
+        self._until[key] = now + self.window
+        while self._until:
+            oldest_key, until = next(iter(self._until.items()))
+            if until > now and len(self._until) <= self.maxsize:
+                break
+            del self._until[oldest_key]
+
+    def is_recent(self, key: bytes) -> bool:
+        until = self._until.get(key)
+        return until is not None and until > time.monotonic()
+
+
+recent_writers = RecentWriters(float(os.getenv("READ_YOUR_WRITES_SECONDS", "5")))
+
+
+def client_key(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+def _request_client_key(request: Request) -> Optional[bytes]:
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    return client_key(token) if token else None
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_recent_writer(session):
+    # 요청 세션(get_db)에서 커밋하면 그 클라이언트의 다음 조회는 primary로
+    key = session.info.get("client_key")
+    if key is not None:
+        recent_writers.mark(key)
 Base = declarative_base()
 
 
@@ -62,6 +293,24 @@ class Schedule(Base):
     is_available = Column(Boolean, default=True)  # 수업 배정 가능 여부
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # 낙관적 락 (concurrency.py)
+
+    # 인덱스는 migrations.py에서 생성
+    __table_args__ = (
+        Index("ix_schedules_teacher_available_start", "teacher_id", "is_available", "start_time"),
+        # 선생 캘린더 기간 조회
+        Index("ix_schedules_teacher_start", "teacher_id", "start_time"),
+        # 목록 ETag 검증자 (count, max(updated_at))를 인덱스만으로 계산
+        Index("ix_schedules_teacher_start_updated", "teacher_id", "start_time", "updated_at"),
+        # 배정 가능한 슬롯만 담는 부분 인덱스 (데스크 가능 시간 조회)
+        Index(
+            "ix_schedules_open_start",
+            "start_time", "teacher_id",
+            postgresql_where=text("is_available"),
+            sqlite_where=text("is_available = 1")
+        ),
+    )
+    __mapper_args__ = {"version_id_col": version}
 
 
 class Class(Base):
@@ -76,17 +325,80 @@ class Class(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     accepted_at = Column(DateTime, nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # 낙관적 락 (concurrency.py)
 
+    __table_args__ = (
+        Index("ix_classes_teacher_status_created", "teacher_id", "status", "created_at"),
+        Index("ix_classes_schedule_status", "schedule_id", "status"),
+        # 목록 ETag 검증자 (count, max(updated_at))를 인덱스만으로 계산
+        Index("ix_classes_teacher_status_updated", "teacher_id", "status", "updated_at"),
+        # 스케줄당 수락된 수업은 최대 하나 (이중 배정 방지)
+        Index(
+            "uq_classes_schedule_accepted",
+            "schedule_id",
+            unique=True,
+            postgresql_where=text("status = 'accepted'"),
+            sqlite_where=text("status = 'accepted'")
+        ),
+    )
+    __mapper_args__ = {"version_id_col": version}
 
-async def init_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
 
+# 선생별 월 근무시간 집계 (수락된 수업 기준, rollup.py에서 같은 트랜잭션으로 갱신)
+class TeacherMonthRollup(Base):
+    __tablename__ = "teacher_month_rollup"
 
-async def get_db():
-    async with AsyncSessionLocal() as session:
+    teacher_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    year = Column(Integer, primary_key=True)
+    month = Column(Integer, primary_key=True)
+    total_minutes = Column(Integer, nullable=False, default=0)
+    classes_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_teacher_month_rollup_year_month", "year", "month"),
+    )
+
+
+def _session_factory(request: Request, allow_replica: bool):
+    if request.method not in READ_METHODS:
+        return WriteSessionLocal
+    if allow_replica and ReplicaSessionLocal is not None:
+        key = _request_client_key(request)
+        if key is None or not recent_writers.is_recent(key):
+            return ReplicaSessionLocal
+    return AsyncSessionLocal
+
+
+async def _request_session(request: Request, allow_replica: bool):
+    async with _session_factory(request, allow_replica)() as session:
+        session.info["client_key"] = _request_client_key(request)
         try:
             yield session
         finally:
             await session.close()
 
+
+async def get_db(request: Request):
+    """요청 메서드에 맞는 세션
+
+    조회 요청은 읽기 복제본(설정 시, 본인이 방금 쓴 경우 제외), 쓰기 요청은 쓰기 엔진.
+    """
+    async for session in _request_session(request, allow_replica=True):
+        yield session
+
+
+async def get_primary_db(request: Request):
+    """복제 지연 없이 primary에서 읽어야 하는 조회용 세션"""
+    async for session in _request_session(request, allow_replica=False):
+        yield session
+
+
+async def get_read_db(request: Request):
+    """POST지만 읽기만 하는 요청용 primary 읽기 세션 (SQLite 쓰기 연결을 잡지 않음)"""
+    async with AsyncSessionLocal() as session:
+        session.info["client_key"] = _request_client_key(request)
+        try:
+            yield session
+        finally:
+            await session.close()
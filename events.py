@@ -0,0 +1,71 @@
+"""실시간 알림 (SSE)
+
+선생은 새로 배정된 수업을, 데스크는 선생의 수락/거절을 스트림으로 받는다.
+메시지는 pubsub 브로커로 모든 워커에 전달되고, 연결된 워커가 클라이언트로 내보낸다.
+놓친 이벤트는 다시 보내지 않으므로 클라이언트는 (재)연결 직후 목록을 한 번 조회한다.
+"""
+import asyncio
+import json
+import os
+import time
+from typing import AsyncIterator, Iterable, List
+from fastapi.responses import StreamingResponse
+from models import ClassResponse
+from pubsub import broker
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DESK_CHANNEL = "desk"
+
+# 프록시가 유휴 연결을 끊지 않도록 보내는 주석 간격 (초)
+HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+# 스트림 최대 유지 시간 (초), 토큰 만료/Cloud Run 요청 제한 전에 끊고 재연결하게 함
+MAX_STREAM_SECONDS = float(os.getenv("EVENTS_MAX_STREAM_SECONDS", "3300"))
+# 재연결 대기 시간 안내 (ms)
+RETRY_MILLISECONDS = 3000
+
+
+def teacher_channel(teacher_id: int) -> str:
+    return f"teacher:{teacher_id}"
+
+
+def class_event(event: str, class_obj) -> dict:
+    return {"event": event, "data": ClassResponse.model_validate(class_obj).model_dump(mode="json")}
+
+
+async def publish_class_events(event: str, classes: Iterable, channel_for) -> None:
+    """수업별 이벤트 발행 (커밋 후 호출), channel_for(class_obj) -> 채널"""
+    await broker.publish_many([
+        (channel_for(class_obj), class_event(event, class_obj)) for class_obj in classes
+    ])
+
+
+def format_sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+async def _event_stream(channels: List[str]) -> AsyncIterator[str]:
+    async with broker.subscribe(*channels) as subscription:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+        deadline = time.monotonic() + MAX_STREAM_SECONDS
+        while not subscription.overflowed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                message = await asyncio.wait_for(
+                    subscription.queue.get(), timeout=min(HEARTBEAT_SECONDS, remaining)
+                )
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield format_sse(message["event"], message["data"])
+
+
+def event_stream_response(channels: List[str]) -> StreamingResponse:
+    return StreamingResponse(
+        _event_stream(channels),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,162 @@
+"""대용량 목록 응답의 빠른 직렬화 경로
+
+ORM 객체와 Pydantic 검증 없이 Core 행(tuple)에서 바로 dict를 만들고 orjson(설치되어
+있지 않으면 표준 json)으로 인코딩한다. 필드 순서는 응답 모델 정의 순서를 따르고
+datetime은 isoformat이라, response_model로 직렬화한 것과 바이트 단위로 같다.
+
+- fields=a,b,c: 필요한 필드만 응답 (중첩 목록은 schedules.start_time 형식)
+- Accept-Encoding에 gzip이 있고 본문이 크면 gzip으로 압축
+
+선택 사항이다. FAST_JSON_RESPONSES=true이거나 fields를 지정한 요청만 이 경로를 쓰고,
+기본은 응답 모델로 검증/직렬화한다 (use_fast_path).
+"""
+import gzip
+import json
+import os
+import typing
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Type
+from fastapi import HTTPException, Request, Response, status
+from pydantic import BaseModel, TypeAdapter
+from models import ScheduleResponse
+from dotenv import load_dotenv
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+load_dotenv()
+
+# 이보다 작은 본문은 압축하지 않음 (bytes)
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", "4096"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+# true면 fields가 없는 요청도 빠른 경로로 응답 (기본은 response_model 경로)
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "false").lower() == "true"
+
+SCHEDULE_FIELDS: Tuple[str, ...] = tuple(ScheduleResponse.model_fields)
+
+# {필드: None(전체) 또는 중첩 필드 집합}, None이면 모든 필드
+FieldSet = Optional[Dict[str, Optional[Set[str]]]]
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    """FastAPI 기본 JSONResponse와 같은 형식으로 인코딩 (공백 없음, UTF-8 그대로)"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default
+    ).encode("utf-8")
+
+
+def use_fast_path(fieldset: FieldSet) -> bool:
+    """빠른 경로 사용 여부 (fields는 응답 모델의 필수 필드를 뺄 수 있어 항상 빠른 경로)"""
+    return FAST_JSON_RESPONSES or fieldset is not None
+
+
+_adapters: Dict[Any, TypeAdapter] = {}
+
+
+def model_dumps(response_type: Any, content) -> bytes:
+    """기본 경로: response_type으로 검증한 뒤 직렬화 (response_model과 같은 처리)"""
+    adapter = _adapters.get(response_type)
+    if adapter is None:
+        adapter = _adapters[response_type] = TypeAdapter(response_type)
+    return adapter.dump_json(adapter.validate_python(content))
+
+
+def schedule_dict(row: Iterable) -> dict:
+    """SCHEDULE_RESPONSE_COLUMNS 순서의 행을 ScheduleResponse 형태 dict로"""
+    return dict(zip(SCHEDULE_FIELDS, row))
+
+
+def _nested_model(model: Type[BaseModel], name: str) -> Optional[Type[BaseModel]]:
+    for arg in typing.get_args(model.model_fields[name].annotation):
+        if isinstance(arg, type) and issubclass(arg, BaseModel):
+            return arg
+    return None
+
+
+def parse_fields(fields: Optional[str], model: Type[BaseModel]) -> FieldSet:
+    """fields 쿼리 파라미터 검증/변환 (모르는 필드면 400)"""
+    if not fields:
+        return None
+    selected: Dict[str, Optional[Set[str]]] = {}
+    for path in fields.split(","):
+        path = path.strip()
+        if not path:
+            continue
+        name, _, child = path.partition(".")
+        nested = _nested_model(model, name) if name in model.model_fields else None
+        if name not in model.model_fields or (child and (nested is None or child not in nested.model_fields)):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown field: {path}"
+            )
+        if not child:
+            selected[name] = None
+        elif name not in selected:
+            selected[name] = {child}
+        elif selected[name] is not None:
+            selected[name].add(child)
+    return selected or None
+
+
+def fields_key(fieldset: FieldSet) -> Optional[tuple]:
+    """캐시 키용 정규화 (순서 무관)"""
+    if fieldset is None:
+        return None
+    return tuple(sorted(
+        (name, tuple(sorted(children)) if children is not None else None)
+        for name, children in fieldset.items()
+    ))
+
+
+def project(item: dict, fieldset: FieldSet) -> dict:
+    """선택한 필드만 남김 (응답 모델 필드 순서 유지)"""
+    if fieldset is None:
+        return item
+    projected = {}
+    for name, value in item.items():
+        if name not in fieldset:
+            continue
+        children = fieldset[name]
+        if children is not None:
+            value = [{key: nested[key] for key in nested if key in children} for nested in value]
+        projected[name] = value
+    return projected
+
+
+def project_many(items: List[dict], fieldset: FieldSet) -> List[dict]:
+    if fieldset is None:
+        return items
+    return [project(item, fieldset) for item in items]
+
+
+def _accepts_gzip(request: Request) -> bool:
+    for part in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = part.partition(";")
+        if coding.strip().lower() != "gzip":
+            continue
+        quality = params.strip().removeprefix("q=")
+        try:
+            return not params.strip() or float(quality) > 0
+        except ValueError:
+            return False
+    return False
+
+
+def json_response(request: Request, body: bytes) -> Response:
+    """인코딩된 JSON 본문 응답 (크면 gzip)"""
+    response = Response(content=body, media_type="application/json")
+    if len(body) >= GZIP_MIN_BYTES and _accepts_gzip(request):
+        response = Response(content=gzip.compress(body, GZIP_LEVEL), media_type="application/json")
+        response.headers["Content-Encoding"] = "gzip"
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
@@ -0,0 +1,202 @@
+"""워커 간 캐시 무효화 버스
+
+쓰기 요청은 커밋 후 바뀐 엔티티의 키를 발행하고, 다른 워커는 받은 키로 자기
+프로세스의 캐시를 비우거나 다시 읽는다. 발행한 워커는 이미 직접 캐시를 갱신했으므로
+자기 메시지는 무시한다 (origin으로 구분). 단 local로 등록한 처리기는 발행할 때 자기
+프로세스에도 바로 적용한다. 전달은 pubsub 브로커의 백엔드를 사용한다.
+
+다른 워커에서 받은 키의 가능 시간 인덱스 갱신은 DB를 다시 읽는 동안 백그라운드로
+진행된다. 그 사이 요청이 이전 인덱스로 응답을 캐시할 수 있으므로, local 처리기(응답
+캐시 무효화)는 진행 중인 갱신이 모두 끝난 뒤 한 번 더 적용한다.
+
+백엔드 연결이 끊긴 동안 발행된 키는 받지 못하므로, 다시 연결되면 resync 처리기로
+캐시를 모두 비우고 가능 시간 인덱스를 다시 적재한다.
+
+키 형식:
+    user:{id}                      유저 (역할/이름 변경)
+    teacher:{id}                   선생 단위 (역할 변경으로 가능 시간 인덱스 재적재)
+    schedule:{id}                  스케줄 (생성/변경/삭제, 배정 가능 여부)
+    teacher-month:{id}:{YYYY-MM}   선생의 해당 월 일정/수업 (스케줄 생성/삭제, 배정, 수락)
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+from uuid import uuid4
+from pubsub import Broker, broker
+from user_cache import user_cache
+from availability_index import availability_index, availability_index_enabled
+from response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "invalidate"
+# NOTIFY payload 제한 안에 들어가도록 메시지 하나에 담는 키 수
+KEYS_PER_MESSAGE = 200
+
+# 같은 종류의 키 식별자 목록을 받는 처리기 (동기 또는 async)
+Handler = Callable[[List[str]], Optional[Awaitable[None]]]
+
+
+def user_key(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def teacher_key(teacher_id: int) -> str:
+    return f"teacher:{teacher_id}"
+
+
+def schedule_key(schedule_id: int) -> str:
+    return f"schedule:{schedule_id}"
+
+
+def teacher_month_key(teacher_id: int, when: datetime) -> str:
+    return f"teacher-month:{teacher_id}:{when.year}-{when.month:02d}"
+
+
+class InvalidationBus:
+    def __init__(self, broker: Broker):
+        self.broker = broker
+        self.origin = uuid4().hex
+        self.published = 0
+        self.received = 0
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._local_handlers: Dict[str, List[Handler]] = {}
+        self._resync_handlers: List[Callable[[], Optional[Awaitable[None]]]] = []
+        self._tasks: Set[asyncio.Task] = set()
+        broker.add_listener(INVALIDATION_CHANNEL, self._on_message)
+        broker.add_reconnect_listener(self._on_reconnect)
+
+    def register(self, kind: str, handler: Handler, local: bool = False):
+        """키 종류(user, schedule, ...)별 처리기 등록
+
+        local=True면 이 워커가 발행한 키에도 발행 즉시 적용하고, 다른 워커에서 받은 키에는
+        진행 중인 async 처리기가 끝난 뒤 한 번 더 적용한다 (동기 처리기만).
+        """
+        self._handlers.setdefault(kind, []).append(handler)
+        if local:
+            self._local_handlers.setdefault(kind, []).append(handler)
+
+    def register_resync(self, handler: Callable[[], Optional[Awaitable[None]]]):
+        """백엔드가 다시 연결될 때 호출할 처리기 등록 (끊긴 동안 놓친 키 보정)"""
+        self._resync_handlers.append(handler)
+
+    async def publish(self, keys: Iterable[str]):
+        """바뀐 엔티티 키 발행 (커밋 후 호출)"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return
+        self._dispatch(keys, self._local_handlers)
+        self.published += len(keys)
+        await self.broker.publish_many([
+            (INVALIDATION_CHANNEL, {"origin": self.origin, "keys": keys[start:start + KEYS_PER_MESSAGE]})
+            for start in range(0, len(keys), KEYS_PER_MESSAGE)
+        ])
+
+    def _on_message(self, message: dict):
+        if message.get("origin") == self.origin:
+            return
+        keys = message.get("keys", [])
+        self.received += len(keys)
+        self.apply(keys)
+
+    def _on_reconnect(self):
+        logger.info("Invalidation bus reconnected; resyncing caches")
+        for handler in self._resync_handlers:
+            result = handler()
+            if asyncio.iscoroutine(result):
+                self._spawn("resync", result)
+
+    def apply(self, keys: Iterable[str]):
+        """키를 종류별로 모아 처리기 호출 (async 처리기는 백그라운드 실행)"""
+        keys = list(keys)
+        self._dispatch(keys, self._handlers)
+        if self._tasks:
+            # 앞선 메시지의 갱신도 포함해서 모두 끝난 뒤 응답 캐시를 다시 무효화
+            self._spawn("deferred", self._after_refresh(set(self._tasks), keys))
+
+    async def _after_refresh(self, tasks: Set[asyncio.Task], keys: List[str]):
+        await asyncio.wait(tasks)
+        self._dispatch(keys, self._local_handlers)
+
+    def _dispatch(self, keys: Iterable[str], handlers: Dict[str, List[Handler]]):
+        grouped: Dict[str, List[str]] = {}
+        for key in keys:
+            kind, _, identifier = key.partition(":")
+            grouped.setdefault(kind, []).append(identifier)
+        for kind, identifiers in grouped.items():
+            for handler in handlers.get(kind, ()):
+                result = handler(identifiers)
+                if asyncio.iscoroutine(result):
+                    self._spawn(kind, result)
+
+    def _spawn(self, kind: str, coroutine: Awaitable[None]):
+        task = asyncio.get_running_loop().create_task(self._run(kind, coroutine))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, kind: str, coroutine: Awaitable[None]):
+        try:
+            await coroutine
+        except Exception:
+            logger.exception("Invalidation handler for %s failed", kind)
+
+    def stats(self) -> dict:
+        return {
+            "published_keys": self.published,
+            "received_keys": self.received,
+            "pending_tasks": len(self._tasks),
+        }
+
+
+def _evict_users(identifiers: List[str]):
+    for user_id in identifiers:
+        user_cache.invalidate(int(user_id))
+
+
+async def _refresh_teachers(identifiers: List[str]):
+    for teacher_id in identifiers:
+        await availability_index.refresh_teacher(int(teacher_id))
+
+
+async def _refresh_schedules(identifiers: List[str]):
+    await availability_index.refresh_schedules(int(schedule_id) for schedule_id in identifiers)
+
+
+def _evict_teacher_responses(identifiers: List[str]):
+    for teacher_id in identifiers:
+        response_cache.evict(int(teacher_id))
+
+
+def _evict_teacher_month_responses(identifiers: List[str]):
+    for identifier in identifiers:
+        teacher_id, _, year_month = identifier.partition(":")
+        year, _, month = year_month.partition("-")
+        response_cache.evict(int(teacher_id), int(year) * 12 + int(month) - 1)
+
+
+async def _resync_caches():
+    user_cache.clear()
+    response_cache.clear()
+    if availability_index_enabled():
+        try:
+            await availability_index.load()
+        except Exception:
+            # 이전 인덱스는 놓친 변경이 있을 수 있으므로 버리고 SQL로 조회
+            availability_index.clear()
+            raise
+    # 다시 적재하는 동안 이전 인덱스로 캐시된 응답 제거
+    response_cache.clear()
+
+
+invalidation_bus = InvalidationBus(broker)
+invalidation_bus.register("user", _evict_users)
+invalidation_bus.register("teacher", _refresh_teachers)
+invalidation_bus.register("schedule", _refresh_schedules)
+invalidation_bus.register("teacher", _evict_teacher_responses, local=True)
+invalidation_bus.register("teacher-month", _evict_teacher_month_responses, local=True)
+invalidation_bus.register_resync(_resync_caches)
+
+
+async def invalidate(*keys: str):
+    await invalidation_bus.publish(keys)
@@ -1,24 +1,45 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from contextlib import asynccontextmanager
-from database import init_db, get_db, User
+from database import get_db, engine, write_engine, replica_engine, User
+from migrations import ensure_schema
+from availability_index import availability_index, availability_index_enabled
 from auth import get_current_user
+from pubsub import broker
+import metrics
+from profiler import ProfilerMiddleware, PROFILE_ID_HEADER, profiler_enabled
 from routers import teacher, desk
 from models import UserResponse
+import hmac
 import os
 import re
+import logging
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # 시작 시 데이터베이스 초기화
-    await init_db()
+    # 시작 시 스키마 버전 확인 (운영 DB 마이그레이션은 배포 단계에서 실행)
+    await ensure_schema()
+    # 가능 시간 메모리 인덱스 적재 (실패하면 SQL로 조회)
+    if availability_index_enabled():
+        try:
+            await availability_index.load()
+        except Exception:
+            logger.exception("Failed to load availability index; falling back to SQL")
+    # 실시간 알림 브로커 (postgres 연결 실패는 백그라운드에서 재시도)
+    try:
+        await broker.start()
+    except Exception:
+        logger.exception("Failed to start pub/sub broker; realtime events disabled")
     yield
-    # 종료 시 정리 작업 (필요시)
+    # 종료 시 정리 작업
+    await broker.stop()
 
 app = FastAPI(
     title="Mega Schedule API",
@@ -50,8 +71,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified", PROFILE_ID_HEADER],
 )
 
+# 요청 프로파일러 (PROFILE_* 설정이 없으면 등록하지 않음)
+if profiler_enabled():
+    app.add_middleware(ProfilerMiddleware, router=app.router)
+
+# 요청별 지연 시간/쿼리 수/DB 시간 계측 (METRICS_ENABLED=false면 등록하지 않음)
+if metrics.METRICS_ENABLED:
+    metrics.install_engine_listeners(engine, write_engine, replica_engine)
+    app.add_middleware(metrics.MetricsMiddleware)
+
 # 라우터 등록
 app.include_router(teacher.router)
 app.include_router(desk.router)
@@ -77,3 +108,14 @@ async def health_check():
     """헬스 체크"""
     return {"status": "healthy"}
 
+
+@app.get("/api/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    """Prometheus 형식 지표 (워커 프로세스 단위)"""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metrics disabled")
+    if metrics.METRICS_TOKEN:
+        authorization = request.headers.get("authorization", "")
+        if not hmac.compare_digest(authorization.encode(), f"Bearer {metrics.METRICS_TOKEN}".encode()):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
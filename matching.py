@@ -0,0 +1,398 @@
+"""학생 일괄 자동 배정 (최소 비용 유량)
+
+학생마다 가능한 시간대(windows)와 선호 선생이 있고, 비어 있는 스케줄 슬롯 하나씩을
+배정한다. 그래프는
+
+    source -> 학생 그룹 -> 슬롯 -> (선생, 월) -> sink
+
+이고 (선생, 월) -> sink 간선은 k번째 배정일수록 비용이 커지는(볼록) 병렬 간선이라
+같은 달에 이미 많이 일하는 선생보다 적게 일하는 선생에게 먼저 배정된다. 선호 선생이
+아닌 슬롯에는 PREFERENCE_PENALTY를 더한다. 최대 유량(최대한 많은 학생 배정) 중
+비용이 가장 작은 해를 구한다.
+
+- 조건(시간대, 선호, 최소 길이)이 같은 학생은 한 그룹(용량 = 학생 수)으로 묶음
+- 후보 슬롯이 많으면 학생당 MATCHING_CANDIDATES개 정도로 추려서 그래프 크기를 제한
+  (선호 선생 슬롯은 모두 포함, 나머지는 그룹별 시드로 고르게 추출)
+- 비용은 정수라서 primal-dual(다익스트라 + 0 비용 간선에서 blocking flow) 단계 수가 적음
+"""
+import heapq
+import os
+import random
+from bisect import bisect_left
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+from database import TeacherMonthRollup
+from queries import open_slots_query, pending_class_slots_query, month_range
+from response_cache import month_number
+from rollup import slot_minutes
+
+load_dotenv()
+
+# 학생 한 명당 후보 슬롯 수 (이보다 많으면 추림)
+MATCHING_CANDIDATES = int(os.getenv("MATCHING_CANDIDATES", "16"))
+# 부하 비용 1단계에 해당하는 월 근무 시간 (분)
+MATCHING_LOAD_STEP_MINUTES = int(os.getenv("MATCHING_LOAD_STEP_MINUTES", "240"))
+# 선호 선생이 아닌 슬롯의 추가 비용 (부하 비용 단계 수)
+PREFERENCE_PENALTY = int(os.getenv("MATCHING_PREFERENCE_PENALTY", "3"))
+
+INF = float("inf")
+
+
+class OpenSlot(NamedTuple):
+    id: int
+    version: int
+    teacher_id: int
+    teacher_name: str
+    start_time: datetime
+    end_time: datetime
+
+
+class StudentSpec(NamedTuple):
+    """학생 한 명의 조건 (windows는 (시작, 종료) 목록, 슬롯 전체가 한 구간 안에 있어야 함)"""
+    windows: Tuple[Tuple[datetime, datetime], ...]
+    preferred_teacher_ids: frozenset
+    preferred_only: bool
+    min_duration: Optional[int]
+
+
+class Assignment(NamedTuple):
+    student_index: int
+    slot: OpenSlot
+    preferred: bool
+
+
+class TeacherLoad(NamedTuple):
+    teacher_id: int
+    year: int
+    month: int
+    base_minutes: int
+    planned_minutes: int
+    planned_classes: int
+
+
+class MatchingPlan(NamedTuple):
+    assignments: List[Assignment]
+    unmatched: List[int]
+    loads: List[TeacherLoad]
+    candidate_edges: int
+    cost: int
+
+
+class FlowGraph:
+    """정수 비용 최소 비용 유량 (간선 e의 역방향은 e ^ 1)"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.adjacency: List[List[int]] = [[] for _ in range(size)]
+        self.to: List[int] = []
+        self.cap: List[int] = []
+        self.cost: List[int] = []
+        # 볼록 간선: 포화되면 다음 비용의 간선을 추가 (간선 -> 남은 비용)
+        self._next_costs: Dict[int, Iterator[int]] = {}
+
+    def add_node(self) -> int:
+        self.adjacency.append([])
+        self.size += 1
+        return self.size - 1
+
+    def add_edge(self, tail: int, head: int, capacity: int, cost: int) -> int:
+        edge = len(self.to)
+        self.to += (head, tail)
+        self.cap += (capacity, 0)
+        self.cost += (cost, -cost)
+        self.adjacency[tail].append(edge)
+        self.adjacency[head].append(edge + 1)
+        return edge
+
+    def add_convex_edges(self, tail: int, head: int, costs: Iterable[int]):
+        """용량 1, 비용이 costs 순서로 (감소하지 않게) 커지는 병렬 간선
+
+        앞 간선이 포화될 때마다 다음 간선을 추가하므로 그래프에는 한 번에 하나씩만 있다.
+        축약 비용이 음수가 되지 않으려면 costs가 감소하지 않아야 한다.
+        """
+        costs = iter(costs)
+        cost = next(costs, None)
+        if cost is not None:
+            self._next_costs[self.add_edge(tail, head, 1, cost)] = costs
+
+    def _saturated(self, edge: int):
+        costs = self._next_costs.pop(edge, None)
+        if costs is not None:
+            self.add_convex_edges(self.to[edge ^ 1], self.to[edge], costs)
+
+    def flow(self, edge: int) -> int:
+        return self.cap[edge ^ 1]
+
+    def solve(self, source: int, sink: int) -> Tuple[int, int]:
+        """최대 유량 중 최소 비용 (초기 간선 비용은 모두 0 이상이어야 함), (유량, 비용) 반환"""
+        potential = [0] * self.size
+        total_flow = 0
+        while True:
+            distance = self._shortest_paths(source, sink, potential)
+            sink_distance = distance[sink]
+            if sink_distance == INF:
+                break
+            # 거리가 sink보다 먼 노드는 sink 거리만큼만 올려야 축약 비용이 음수가 되지 않음
+            for node, value in enumerate(distance):
+                potential[node] += value if value < sink_distance else sink_distance
+            total_flow += self._blocking_flows(source, sink, potential)
+        total_cost = sum(self.cost[edge] * self.cap[edge + 1] for edge in range(0, len(self.to), 2))
+        return total_flow, total_cost
+
+    def _shortest_paths(self, source: int, sink: int, potential: List[int]) -> list:
+        """축약 비용 기준 다익스트라 (sink까지 확정되면 중단)"""
+        adjacency, to, cap, cost = self.adjacency, self.to, self.cap, self.cost
+        distance = [INF] * self.size
+        distance[source] = 0
+        heap = [(0, source)]
+        while heap:
+            value, node = heapq.heappop(heap)
+            if value > distance[node]:
+                continue
+            if node == sink:
+                break
+            base = value + potential[node]
+            for edge in adjacency[node]:
+                if cap[edge] > 0:
+                    head = to[edge]
+                    candidate = base + cost[edge] - potential[head]
+                    if candidate < distance[head]:
+                        distance[head] = candidate
+                        heapq.heappush(heap, (candidate, head))
+        return distance
+
+    def _blocking_flows(self, source: int, sink: int, potential: List[int]) -> int:
+        """축약 비용 0인 간선만으로 더 보낼 수 없을 때까지 증가 (Dinic)"""
+        adjacency, to, cap, cost = self.adjacency, self.to, self.cap, self.cost
+        total = 0
+        while True:
+            level = [-1] * self.size
+            level[source] = 0
+            queue = [source]
+            sink_level = self.size
+            for node in queue:
+                next_level = level[node] + 1
+                if next_level > sink_level:
+                    # sink보다 깊은 노드는 증가 경로에 쓰이지 않음
+                    break
+                node_potential = potential[node]
+                for edge in adjacency[node]:
+                    if cap[edge] > 0:
+                        head = to[edge]
+                        if level[head] < 0 and cost[edge] + node_potential == potential[head]:
+                            level[head] = next_level
+                            queue.append(head)
+                            if head == sink:
+                                sink_level = next_level
+            if level[sink] < 0:
+                return total
+
+            cursor = [0] * self.size
+            path: List[int] = []
+            node = source
+            while True:
+                if node == sink:
+                    pushed = min(cap[edge] for edge in path)
+                    for edge in path:
+                        cap[edge] -= pushed
+                        cap[edge ^ 1] += pushed
+                        if not cap[edge] and edge in self._next_costs:
+                            self._saturated(edge)
+                    total += pushed
+                    path.clear()
+                    node = source
+                    continue
+
+                edges = adjacency[node]
+                count = len(edges)
+                index = cursor[node]
+                next_level = level[node] + 1
+                node_potential = potential[node]
+                while index < count:
+                    edge = edges[index]
+                    if cap[edge] > 0:
+                        head = to[edge]
+                        if level[head] == next_level and cost[edge] + node_potential == potential[head]:
+                            break
+                    index += 1
+                cursor[node] = index
+                if index < count:
+                    edge = edges[index]
+                    path.append(edge)
+                    node = to[edge]
+                    continue
+
+                # 막다른 노드: 이번 단계에서 제외하고 한 칸 되돌아감
+                level[node] = -1
+                if not path:
+                    break
+                edge = path.pop()
+                node = to[edge ^ 1]
+                cursor[node] += 1
+
+
+def load_cost(base_minutes: int, classes: int, average_minutes: float) -> int:
+    """(선생, 월)에 classes번째 수업을 더할 때의 비용 (단계별로 증가)"""
+    return int((base_minutes + classes * average_minutes) // MATCHING_LOAD_STEP_MINUTES)
+
+
+class SlotTable:
+    """후보 검색용 슬롯 배열 (시작 시간 순)"""
+
+    def __init__(self, slots: Sequence[OpenSlot]):
+        self.slots = slots
+        self.starts = [slot.start_time for slot in slots]
+        self.ends = [slot.end_time for slot in slots]
+        self.minutes = [slot_minutes(slot.start_time, slot.end_time) for slot in slots]
+        self.by_teacher: Dict[int, List[int]] = {}
+        for index, slot in enumerate(slots):
+            self.by_teacher.setdefault(slot.teacher_id, []).append(index)
+        self.teacher_starts = {
+            teacher_id: [self.starts[index] for index in indexes]
+            for teacher_id, indexes in self.by_teacher.items()
+        }
+
+    def _fitting(self, indexes: Iterable[int], window_end: datetime, min_duration: Optional[int]) -> Iterable[int]:
+        ends, minutes = self.ends, self.minutes
+        for index in indexes:
+            if ends[index] <= window_end and (not min_duration or minutes[index] >= min_duration):
+                yield index
+
+    def candidates(self, spec: StudentSpec, seed: int, limit: int) -> List[int]:
+        """조건을 만족하는 슬롯 인덱스 (선호 선생 슬롯 우선, 최대 limit개)"""
+        rnd = random.Random(seed)
+        preferred = set()
+        for teacher_id in spec.preferred_teacher_ids:
+            indexes = self.by_teacher.get(teacher_id, [])
+            teacher_starts = self.teacher_starts.get(teacher_id, [])
+            for window_start, window_end in spec.windows:
+                positions = range(bisect_left(teacher_starts, window_start), bisect_left(teacher_starts, window_end))
+                preferred.update(self._fitting((indexes[position] for position in positions), window_end, spec.min_duration))
+        if spec.preferred_only or len(preferred) >= limit:
+            preferred = sorted(preferred)
+            return rnd.sample(preferred, limit) if len(preferred) > limit else preferred
+
+        # 나머지는 시간대마다 고르게 추출 (구간이 넓으면 전부 보지 않음, 조건에 안 맞는 슬롯을 감안해 여유 있게)
+        wanted = limit - len(preferred)
+        quota = -(-wanted * 2 // len(spec.windows))
+        others = set()
+        for window_start, window_end in spec.windows:
+            positions = range(bisect_left(self.starts, window_start), bisect_left(self.starts, window_end))
+            if len(positions) > quota * 2:
+                positions = rnd.sample(positions, quota * 2)
+            others.update(self._fitting(positions, window_end, spec.min_duration))
+        others = sorted(others - preferred)
+        if len(others) > wanted:
+            others = rnd.sample(others, wanted)
+        return sorted(preferred) + others
+
+
+def plan_assignments(
+    specs: Sequence[StudentSpec],
+    slots: Sequence[OpenSlot],
+    base_minutes: Dict[Tuple[int, int], int],
+) -> MatchingPlan:
+    """학생(specs 순서)별 슬롯 배정 계획
+
+    slots는 시작 시간 순, base_minutes는 (선생 ID, month_number) -> 이미 수락/대기 중인
+    수업 시간(분).
+    """
+    table = SlotTable(slots)
+    starts = table.starts
+
+    groups: Dict[StudentSpec, List[int]] = {}
+    for student_index, spec in enumerate(specs):
+        groups.setdefault(spec, []).append(student_index)
+
+    graph = FlowGraph(2)
+    source, sink = 0, 1
+    slot_nodes: Dict[int, int] = {}
+    load_nodes: Dict[Tuple[int, int], int] = {}
+    load_slots: Dict[Tuple[int, int], List[int]] = {}
+    group_edges: List[Tuple[StudentSpec, List[int], List[Tuple[int, int]]]] = []
+    candidate_edges = 0
+
+    for seed, (spec, members) in enumerate(groups.items()):
+        group_node = graph.add_node()
+        graph.add_edge(source, group_node, len(members), 0)
+        edges = []
+        for index in table.candidates(spec, seed, MATCHING_CANDIDATES * len(members)):
+            slot = slots[index]
+            slot_node = slot_nodes.get(index)
+            if slot_node is None:
+                slot_node = slot_nodes[index] = graph.add_node()
+                key = (slot.teacher_id, month_number(slot.start_time))
+                load_node = load_nodes.get(key)
+                if load_node is None:
+                    load_node = load_nodes[key] = graph.add_node()
+                load_slots.setdefault(key, []).append(index)
+                graph.add_edge(slot_node, load_node, 1, 0)
+            preferred = not spec.preferred_teacher_ids or slot.teacher_id in spec.preferred_teacher_ids
+            edges.append((graph.add_edge(group_node, slot_node, 1, 0 if preferred else PREFERENCE_PENALTY), index))
+        candidate_edges += len(edges)
+        group_edges.append((spec, members, edges))
+
+    # (선생, 월)별 볼록 부하 비용: 후보 슬롯 수만큼 비용이 증가하는 병렬 간선
+    for key, indexes in load_slots.items():
+        average = sum(table.minutes[index] for index in indexes) / len(indexes)
+        base = base_minutes.get(key, 0)
+        graph.add_convex_edges(
+            load_nodes[key], sink,
+            [load_cost(base, classes, average) for classes in range(1, len(indexes) + 1)]
+        )
+
+    _, cost = graph.solve(source, sink)
+
+    assignments = []
+    unmatched = []
+    planned: Dict[Tuple[int, int], List[int]] = {}
+    for spec, members, edges in group_edges:
+        chosen = sorted((index for edge, index in edges if graph.flow(edge)), key=lambda index: (starts[index], slots[index].id))
+        for student_index, index in zip(members, chosen):
+            slot = slots[index]
+            preferred = slot.teacher_id in spec.preferred_teacher_ids
+            assignments.append(Assignment(student_index, slot, preferred))
+            planned.setdefault((slot.teacher_id, month_number(slot.start_time)), []).append(index)
+        unmatched.extend(members[len(chosen):])
+
+    loads = []
+    for (teacher_id, month), indexes in sorted(planned.items()):
+        loads.append(TeacherLoad(
+            teacher_id,
+            month // 12,
+            month % 12 + 1,
+            base_minutes.get((teacher_id, month), 0),
+            sum(table.minutes[index] for index in indexes),
+            len(indexes),
+        ))
+
+    assignments.sort(key=lambda assignment: assignment.student_index)
+    return MatchingPlan(assignments, sorted(unmatched), loads, candidate_edges, cost)
+
+
+async def load_open_slots(db: AsyncSession, start_time: datetime, end_time: datetime) -> List[OpenSlot]:
+    result = await db.execute(open_slots_query(start_time, end_time))
+    return [OpenSlot(*row) for row in result.all()]
+
+
+async def load_base_minutes(db: AsyncSession, first_month: int, last_month: int) -> Dict[Tuple[int, int], int]:
+    """(선생 ID, month_number) -> 수락(teacher_month_rollup) + 대기 중인 수업 시간(분)"""
+    base_minutes: Dict[Tuple[int, int], int] = {}
+    month_key = TeacherMonthRollup.year * 12 + TeacherMonthRollup.month - 1
+    rollup_result = await db.execute(
+        select(TeacherMonthRollup.teacher_id, month_key, TeacherMonthRollup.total_minutes)
+        .where(month_key >= first_month, month_key <= last_month)
+    )
+    for teacher_id, month, minutes in rollup_result.all():
+        base_minutes[(teacher_id, month)] = minutes
+
+    start_date, _ = month_range(first_month // 12, first_month % 12 + 1)
+    _, end_date = month_range(last_month // 12, last_month % 12 + 1)
+    pending_result = await db.execute(pending_class_slots_query(start_date, end_date))
+    for teacher_id, start_time, end_time in pending_result.all():
+        key = (teacher_id, month_number(start_time))
+        base_minutes[key] = base_minutes.get(key, 0) + slot_minutes(start_time, end_time)
+    return base_minutes
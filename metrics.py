@@ -0,0 +1,246 @@
+"""요청/DB 계측과 Prometheus 노출 (/api/metrics)
+
+ASGI 미들웨어가 요청마다 RequestStats를 contextvar로 설정하고, SQLAlchemy 커서 실행
+이벤트가 그 요청의 쿼리 수와 DB 시간을 더한다. 요청이 끝나면 라우트 템플릿
+(예: /api/teacher/classes/{class_id}/accept) 기준으로 히스토그램에 기록한다.
+임계값을 넘는 쿼리는 라우트와 함께 로그로 남긴다.
+
+METRICS_ENABLED=false면 미들웨어와 이벤트 리스너를 등록하지 않는다.
+통계는 워커 프로세스 단위다.
+"""
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence, Tuple
+from sqlalchemy import event
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# 이 시간(ms) 이상 걸린 쿼리를 로그로 남김 (0이면 끔)
+SLOW_QUERY_MS = float(os.getenv("METRICS_SLOW_QUERY_MS", "200"))
+# 설정하면 /api/metrics에 "Authorization: Bearer <토큰>" 필요
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+# 라우트에 매칭되지 않은 요청(404 등)은 경로 대신 하나의 라벨로 묶음 (라벨 폭증 방지)
+UNMATCHED_ROUTE = "unmatched"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+AUTH_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, buckets: Sequence[float], labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        # 라벨 -> [버킷별 개수..., 합계, 개수]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[index] += 1
+                break
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+http_requests = Counter(
+    "http_requests_total", "HTTP requests by route template and status", ("method", "route", "status")
+)
+http_duration = Histogram(
+    "http_request_duration_seconds", "Total request latency", LATENCY_BUCKETS, ("method", "route")
+)
+http_db_duration = Histogram(
+    "http_request_db_seconds", "Time spent in SQL statements per request", LATENCY_BUCKETS, ("method", "route")
+)
+http_db_statements = Histogram(
+    "http_request_db_statements", "SQL statements executed per request", STATEMENT_BUCKETS, ("method", "route")
+)
+db_statements = Counter(
+    "db_statements_total", "SQL statements by route template (background work: route=\"-\")", ("route",)
+)
+db_slow_queries = Counter(
+    "db_slow_queries_total", "SQL statements slower than METRICS_SLOW_QUERY_MS", ("route",)
+)
+auth_verify_duration = Histogram(
+    "auth_verify_seconds", "Time spent in verify_google_token", AUTH_BUCKETS, ("result",)
+)
+REGISTRY = (
+    http_requests, http_duration, http_db_duration, http_db_statements,
+    db_statements, db_slow_queries, auth_verify_duration,
+)
+
+
+class RequestStats:
+    """요청 하나의 DB 사용량 (scope는 라우팅 후 route가 채워짐)"""
+
+    __slots__ = ("scope", "statements", "db_seconds")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.statements = 0
+        self.db_seconds = 0.0
+
+    @property
+    def route(self) -> str:
+        return route_template(self.scope)
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request() -> Optional[RequestStats]:
+    return _current.get()
+
+
+def route_template(scope: dict) -> str:
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return path or UNMATCHED_ROUTE
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("metrics_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    stats = _current.get()
+    route = "-"
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += elapsed
+        route = stats.route
+    db_statements.inc(route)
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        db_slow_queries.inc(route)
+        logger.warning("Slow query (%.1f ms) on %s: %s", elapsed * 1000, route, " ".join(statement.split())[:2000])
+
+
+def _handle_error(exception_context):
+    # 실패한 쿼리는 after_cursor_execute가 호출되지 않으므로 시작 시각을 버림
+    connection = exception_context.connection
+    if connection is not None and exception_context.statement is not None:
+        started = connection.info.get("metrics_started")
+        if started:
+            started.pop()
+
+
+def install_engine_listeners(*engines):
+    """커서 실행 이벤트 등록 (같은 엔진이 여러 번 넘어와도 한 번만)"""
+    if not METRICS_ENABLED:
+        return
+    for sync_engine in {id(bound.sync_engine): bound.sync_engine for bound in engines if bound is not None}.values():
+        if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+            continue
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(sync_engine, "handle_error", _handle_error)
+
+
+def observe_auth(seconds: float, ok: bool):
+    if METRICS_ENABLED:
+        auth_verify_duration.observe(seconds, "ok" if ok else "error")
+
+
+class MetricsMiddleware:
+    """요청별 지연 시간/쿼리 수/DB 시간 기록 (스트리밍 응답을 감싸지 않는 순수 ASGI)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            method = scope["method"]
+            route = stats.route
+            http_requests.inc(method, route, str(status_code))
+            http_duration.observe(time.perf_counter() - started, method, route)
+            http_db_duration.observe(stats.db_seconds, method, route)
+            http_db_statements.observe(stats.statements, method, route)
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,201 @@
+"""스키마 마이그레이션 (버전 관리)
+
+배포 단계에서 명시적으로 실행한다 (SQLite/PostgreSQL 공용):
+
+    python migrations.py upgrade   # 최신 버전까지 적용
+    python migrations.py current   # 현재 버전 확인
+
+각 마이그레이션은 자체 트랜잭션에서 실행되고 schema_migrations 테이블에 기록된다.
+여러 프로세스가 동시에 실행해도 겹치지 않도록 잠금을 잡는다 (SQLite는 쓰기 엔진의
+BEGIN IMMEDIATE로 버전 확인과 DDL을 한 트랜잭션에, PostgreSQL은 advisory lock).
+0001은 현재 모델 기준으로 테이블을 만들기 때문에, 이후 컬럼/인덱스를 추가하는
+마이그레이션은 이미 적용된 상태에서도 안전하도록(checkfirst) 작성한다.
+"""
+import argparse
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, MetaData, Table, inspect, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncConnection
+from database import engine, write_engine, Base, DATABASE_URL, User, Schedule, Class, TeacherMonthRollup
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_lock 키 (다른 용도의 advisory lock과 겹치지 않는 임의의 값)
+MIGRATION_LOCK_KEY = 0x6D656761
+
+migration_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def create_index_if_missing(conn: Connection, table, name: str):
+    """모델에 선언된 인덱스를 이름으로 찾아 없을 때만 생성"""
+    index = next(index for index in table.indexes if index.name == name)
+    index.create(conn, checkfirst=True)
+
+
+def add_column_if_missing(conn: Connection, table, name: str):
+    """모델에 선언된 컬럼을 없을 때만 추가 (server_default 포함)"""
+    if name in {column["name"] for column in inspect(conn).get_columns(table.name)}:
+        return
+    column = table.c[name]
+    ddl = f"ALTER TABLE {table.name} ADD COLUMN {name} {column.type.compile(conn.dialect)}"
+    if column.server_default is not None:
+        ddl += f" DEFAULT {column.server_default.arg}"
+    if not column.nullable:
+        ddl += " NOT NULL"
+    conn.execute(text(ddl))
+
+
+def _0001_initial_tables(conn: Connection):
+    Base.metadata.create_all(
+        conn,
+        tables=[
+            User.__table__,
+            Schedule.__table__,
+            Class.__table__,
+            TeacherMonthRollup.__table__,
+        ],
+    )
+
+
+def _0002_hot_path_indexes(conn: Connection):
+    create_index_if_missing(conn, Schedule.__table__, "ix_schedules_teacher_available_start")
+    create_index_if_missing(conn, Schedule.__table__, "ix_schedules_open_start")
+    create_index_if_missing(conn, Class.__table__, "ix_classes_teacher_status_created")
+    create_index_if_missing(conn, Class.__table__, "ix_classes_schedule_status")
+    create_index_if_missing(conn, TeacherMonthRollup.__table__, "ix_teacher_month_rollup_year_month")
+
+
+def _0003_schedule_calendar_index(conn: Connection):
+    create_index_if_missing(conn, Schedule.__table__, "ix_schedules_teacher_start")
+
+
+def _0004_optimistic_locking(conn: Connection):
+    add_column_if_missing(conn, Schedule.__table__, "version")
+    add_column_if_missing(conn, Class.__table__, "version")
+    # 이미 한 스케줄에 수락된 수업이 두 개 이상 있으면 실패한다 (정리 후 다시 실행)
+    create_index_if_missing(conn, Class.__table__, "uq_classes_schedule_accepted")
+
+
+def _0005_list_validator_indexes(conn: Connection):
+    create_index_if_missing(conn, Schedule.__table__, "ix_schedules_teacher_start_updated")
+    create_index_if_missing(conn, Class.__table__, "ix_classes_teacher_status_updated")
+
+
+MIGRATIONS = [
+    (1, "initial tables", _0001_initial_tables),
+    (2, "composite and partial indexes for hot queries", _0002_hot_path_indexes),
+    (3, "schedules(teacher_id, start_time) for calendar windows", _0003_schedule_calendar_index),
+    (4, "version columns and one accepted class per schedule", _0004_optimistic_locking),
+    (5, "covering indexes for list ETag validators", _0005_list_validator_indexes),
+]
+
+HEAD = MIGRATIONS[-1][0]
+
+
+def _current_version(conn: Connection) -> int:
+    if not inspect(conn).has_table("schema_migrations"):
+        return 0
+    versions = conn.execute(select(schema_migrations.c.version)).scalars().all()
+    return max(versions, default=0)
+
+
+async def current_version() -> int:
+    async with engine.connect() as conn:
+        return await conn.run_sync(_current_version)
+
+
+@asynccontextmanager
+async def _migration_connection():
+    """다른 프로세스의 upgrade와 겹치지 않는 연결
+
+    SQLite 쓰기 엔진은 트랜잭션을 BEGIN IMMEDIATE로 시작하므로 트랜잭션마다 쓰기 락을
+    잡은 뒤 버전을 읽는다. PostgreSQL은 연결 동안 세션 advisory lock을 잡는다.
+    """
+    async with write_engine.connect() as conn:
+        if conn.dialect.name != "postgresql":
+            yield conn
+            return
+        await conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        await conn.commit()
+        try:
+            yield conn
+        finally:
+            await conn.rollback()
+            await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            await conn.commit()
+
+
+async def _upgrade(conn: AsyncConnection) -> list:
+    async with conn.begin():
+        await conn.run_sync(migration_metadata.create_all)
+
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        async with conn.begin():
+            if await conn.run_sync(_current_version) >= version:
+                continue
+            logger.info("Applying migration %04d: %s", version, description)
+            await conn.run_sync(migrate)
+            await conn.execute(
+                schema_migrations.insert().values(
+                    version=version,
+                    description=description,
+                    applied_at=datetime.utcnow(),
+                )
+            )
+        applied.append(version)
+    return applied
+
+
+async def upgrade() -> list:
+    """적용되지 않은 마이그레이션 실행, 적용한 버전 목록 반환"""
+    async with _migration_connection() as conn:
+        return await _upgrade(conn)
+
+
+def auto_migrate_enabled() -> bool:
+    # 로컬 SQLite는 기본으로 자동 적용, 운영 DB는 배포 단계에서 명시적으로 실행
+    default = "true" if DATABASE_URL.startswith("sqlite") else "false"
+    return os.getenv("DB_AUTO_MIGRATE", default).lower() == "true"
+
+
+async def ensure_schema():
+    """앱 시작 시 스키마 버전 확인"""
+    if auto_migrate_enabled():
+        await upgrade()
+        return
+
+    version = await current_version()
+    if version < HEAD:
+        raise RuntimeError(
+            f"Database schema is at version {version}, expected {HEAD}. "
+            "Run `python migrations.py upgrade` before starting the app."
+        )
+    if version > HEAD:
+        logger.warning("Database schema version %s is newer than this app (%s)", version, HEAD)
+
+
+async def main(command: str):
+    if command == "upgrade":
+        applied = await upgrade()
+        print(f"applied: {applied or 'none'}")
+    print(f"current version: {await current_version()} (head: {HEAD})")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="스키마 마이그레이션")
+    parser.add_argument("command", choices=["upgrade", "current"])
+    args = parser.parse_args()
+    asyncio.run(main(args.command))
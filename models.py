@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from datetime import datetime
+from datetime import datetime, date, time
 from typing import Optional
 
 
@@ -43,6 +43,38 @@ class ScheduleResponse(ScheduleBase):
         from_attributes = True
 
 
+class RecurringScheduleCreate(BaseModel):
+    """주간 반복 일정 (예: 매주 화/목 14:00~16:00, 3/1~6/30, 일부 날짜 제외)"""
+    weekdays: list[int]  # 0: 월요일 ~ 6: 일요일
+    start_time: time
+    end_time: time
+    start_date: date
+    end_date: date  # 포함
+    except_dates: list[date] = []
+    is_available: bool = True
+    skip_conflicts: bool = False  # True: 겹치는 날짜만 건너뛰고 나머지 등록
+
+
+class ScheduleConflict(BaseModel):
+    start_time: datetime
+    end_time: datetime
+    existing_schedule_id: int
+
+
+class RecurringScheduleResult(BaseModel):
+    created: list[ScheduleResponse]
+    conflicts: list[ScheduleConflict]
+
+
+class CalendarSlotResponse(BaseModel):
+    """캘린더 표시용 최소 스케줄 정보"""
+    id: int
+    start_time: datetime
+    end_time: datetime
+    is_available: bool
+    class_status: Optional[str] = None  # 배정된 수업 상태 (accepted > pending > rejected)
+
+
 class ClassBase(BaseModel):
     student_name: str
     schedule_id: int
@@ -64,10 +96,29 @@ class ClassResponse(ClassBase):
         from_attributes = True
 
 
+class BatchClassResult(BaseModel):
+    index: int  # 요청 목록에서의 위치
+    success: bool
+    assigned_class: Optional[ClassResponse] = None
+    error: Optional[str] = None
+
+
 class ClassAcceptRequest(BaseModel):
     accept: bool  # True: 수락, False: 거절
 
 
+class ClassDecision(BaseModel):
+    class_id: int
+    accept: bool  # True: 수락, False: 거절
+
+
+class ClassDecisionResult(BaseModel):
+    class_id: int
+    success: bool
+    decided_class: Optional[ClassResponse] = None
+    error: Optional[str] = None
+
+
 class TeacherWorkTimeResponse(BaseModel):
     teacher_id: int
     teacher_name: str
@@ -81,3 +132,60 @@ class AvailableTeacherResponse(BaseModel):
     teacher_name: str
     available_schedules: list[ScheduleResponse]
 
+
+
+class MatchingWindow(BaseModel):
+    start_time: datetime
+    end_time: datetime
+
+
+class MatchingStudent(BaseModel):
+    student_name: str
+    windows: list[MatchingWindow]  # 가능한 시간대 (슬롯 전체가 한 구간 안에 있어야 함)
+    preferred_teacher_ids: list[int] = []
+    preferred_only: bool = False  # True: 선호 선생 슬롯만 배정
+    min_duration: Optional[int] = None  # 최소 수업 시간 (분)
+
+
+class MatchingPlanRequest(BaseModel):
+    students: list[MatchingStudent]
+
+
+class MatchingAssignment(BaseModel):
+    index: int  # 요청 students 목록에서의 위치
+    student_name: str
+    schedule_id: int
+    version: int  # 계획 시점의 스케줄 version (확정 시 그대로여야 함)
+    teacher_id: int
+    teacher_name: str
+    start_time: datetime
+    end_time: datetime
+    preferred: bool
+
+
+class MatchingTeacherLoad(BaseModel):
+    teacher_id: int
+    year: int
+    month: int
+    base_hours: float  # 이미 수락/대기 중인 수업 시간
+    planned_hours: float  # 이번 계획으로 추가되는 시간
+    planned_classes: int
+
+
+class MatchingPlanResponse(BaseModel):
+    assignments: list[MatchingAssignment]
+    unmatched: list[int]  # 배정하지 못한 학생 위치
+    teacher_loads: list[MatchingTeacherLoad]
+    open_slots: int
+    candidate_slots: int  # 그래프에 넣은 (학생 그룹, 슬롯) 후보 수
+    cost: int
+
+
+class MatchingCommitItem(BaseModel):
+    student_name: str
+    schedule_id: int
+    version: int
+
+
+class MatchingCommitRequest(BaseModel):
+    assignments: list[MatchingCommitItem]
@@ -0,0 +1,56 @@
+import base64
+import json
+from datetime import datetime
+from typing import AsyncIterator, Optional, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import Class
+from models import ClassResponse
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+STREAM_BATCH_SIZE = 500
+
+
+def encode_cursor(created_at: datetime, class_id: int) -> str:
+    """(created_at, id) 위치를 불투명한 커서 문자열로 변환"""
+    raw = json.dumps([created_at.isoformat(), class_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, class_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(class_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def order_classes_newest_first(query, cursor: Optional[str] = None):
+    """최신순 정렬 + 커서 이후 위치 조건 (created_at, id 키셋)"""
+    if cursor:
+        created_at, class_id = decode_cursor(cursor)
+        query = query.where(tuple_(Class.created_at, Class.id) < tuple_(created_at, class_id))
+    return query.order_by(Class.created_at.desc(), Class.id.desc())
+
+
+async def fetch_class_page(db: AsyncSession, query, limit: int):
+    """한 페이지 조회, (수업 목록, 다음 커서) 반환"""
+    result = await db.execute(query.limit(limit + 1))
+    classes = result.scalars().all()
+    if len(classes) <= limit:
+        return classes, None
+    classes = classes[:limit]
+    last = classes[-1]
+    return classes, encode_cursor(last.created_at, last.id)
+
+
+async def stream_classes_ndjson(db: AsyncSession, query) -> AsyncIterator[str]:
+    """서버 측 커서로 수업을 한 줄씩 JSON으로 내보냄 (메모리 사용량 일정)"""
+    result = await db.stream_scalars(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+    async for class_obj in result:
+        yield ClassResponse.model_validate(class_obj).model_dump_json() + "\n"
@@ -0,0 +1,381 @@
+"""요청 단위 샘플링 프로파일러
+
+별도 스레드가 일정 간격으로 이벤트 루프 스레드의 스택(sys._current_frames)을 읽어
+프로파일 중인 요청의 스택만 모은다. 요청 태스크가 실행 중이면 실제 호출 스택을,
+await로 멈춰 있으면 코루틴 체인(대기 지점)에 "(await)" 프레임을 붙여 기록하므로
+토큰 검증, DB 대기, ORM 객체 생성, Pydantic 검증, 직렬화 시간이 구분된다.
+
+- 요청별: X-Profile 헤더가 PROFILE_SECRET과 같거나, 헤더가 있고 토큰 이메일이
+  PROFILE_DESK_EMAILS에 있으면 프로파일 (응답 헤더 X-Profile-Id)
+- 샘플링: PROFILE_SAMPLE_RATE=N이면 라우트별로 N번째 요청마다 프로파일하고
+  가장 느린 PROFILE_KEEP개만 보관
+- 결과는 워커 프로세스 메모리에만 있고 speedscope JSON 또는 collapsed stack으로 받음
+
+설정이 하나도 없으면 미들웨어를 등록하지 않는다.
+"""
+import asyncio
+import heapq
+import hmac
+import itertools
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
+from starlette.routing import Match
+from dotenv import load_dotenv
+from metrics import route_template, UNMATCHED_ROUTE
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+_PROFILE_HEADER_KEY = PROFILE_HEADER.lower().encode()
+PROFILE_SECRET = os.getenv("PROFILE_SECRET")
+PROFILE_DESK_EMAILS = frozenset(
+    email.strip().lower() for email in re.split(r"[,\s]+", os.getenv("PROFILE_DESK_EMAILS", "")) if email.strip()
+)
+# 0이면 샘플링 모드 끔
+PROFILE_SAMPLE_RATE = int(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "2")) / 1000
+# 동시에 프로파일하는 요청 수 상한 (넘으면 프로파일 없이 처리)
+PROFILE_MAX_ACTIVE = int(os.getenv("PROFILE_MAX_ACTIVE", "4"))
+# 요청 하나의 최대 샘플 수 (넘으면 더 기록하지 않음)
+PROFILE_MAX_SAMPLES = int(os.getenv("PROFILE_MAX_SAMPLES", "20000"))
+
+# 대기 중인 코루틴 스택의 마지막 프레임
+AWAIT_FRAME = "(await)"
+
+
+def profiler_enabled() -> bool:
+    return bool(PROFILE_SECRET or PROFILE_DESK_EMAILS or PROFILE_SAMPLE_RATE > 0)
+
+
+class Profile:
+    """요청 하나의 샘플 (스택은 코드 객체 튜플, 바깥 -> 안쪽 순)"""
+
+    def __init__(self, method: str, path: str, reason: str, task: asyncio.Task, root_frame):
+        self.id = uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.route = UNMATCHED_ROUTE
+        self.reason = reason
+        self.status = None
+        self.started_at = datetime.utcnow()
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.task = task
+        self.root_frame = root_frame
+        self.stacks: List[tuple] = []
+        self.weights: List[float] = []
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "reason": self.reason,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 3),
+            "samples": len(self.stacks),
+        }
+
+    def collapsed(self) -> str:
+        """collapsed stack 형식 ("바깥;...;안쪽 값", 값은 마이크로초)"""
+        totals: Dict[tuple, float] = {}
+        for stack, weight in zip(self.stacks, self.weights):
+            totals[stack] = totals.get(stack, 0.0) + weight
+        lines = []
+        for stack, total in totals.items():
+            lines.append(f"{';'.join(frame_name(key) for key in stack)} {max(round(total * 1_000_000), 1)}")
+        return "\n".join(sorted(lines)) + "\n"
+
+    def speedscope(self) -> dict:
+        """speedscope 파일 형식 (sampled 프로파일, 단위 ms)"""
+        index: Dict[object, int] = {}
+        frames = []
+        samples = []
+        for stack in self.stacks:
+            sample = []
+            for key in stack:
+                position = index.get(key)
+                if position is None:
+                    position = index[key] = len(frames)
+                    frames.append(frame_info(key))
+                sample.append(position)
+            samples.append(sample)
+        name = f"{self.method} {self.path}"
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "mega-schedule profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(self.duration * 1000, 3),
+                "samples": samples,
+                "weights": [round(weight * 1000, 3) for weight in self.weights],
+            }],
+        }
+
+
+_path_prefixes = sorted({os.path.abspath(path) for path in sys.path if path}, key=len, reverse=True)
+
+
+def _short_path(filename: str) -> str:
+    for prefix in _path_prefixes:
+        if filename.startswith(prefix + os.sep):
+            return filename[len(prefix) + 1:]
+    return filename
+
+
+def frame_name(key) -> str:
+    if isinstance(key, str):
+        return key
+    return f"{getattr(key, 'co_qualname', key.co_name)} ({_short_path(key.co_filename)}:{key.co_firstlineno})"
+
+
+def frame_info(key) -> dict:
+    if isinstance(key, str):
+        return {"name": key}
+    return {
+        "name": getattr(key, "co_qualname", key.co_name),
+        "file": _short_path(key.co_filename),
+        "line": key.co_firstlineno,
+    }
+
+
+def _running_stack(frame, root_frame) -> tuple:
+    stack = []
+    while frame is not None:
+        stack.append(frame.f_code)
+        if frame is root_frame:
+            break
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+def _awaiting_stack(task: asyncio.Task, root_frame) -> tuple:
+    stack = []
+    collecting = False
+    awaitable = task.get_coro()
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None)
+        if frame is None:
+            break
+        if frame is root_frame:
+            collecting = True
+        if collecting:
+            stack.append(frame.f_code)
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+    stack.append(AWAIT_FRAME)
+    return tuple(stack)
+
+
+class Sampler:
+    """프로파일 중인 요청이 있을 때만 동작하는 샘플링 스레드"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._active: Dict[str, Tuple[Profile, asyncio.AbstractEventLoop, int]] = {}
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def active_count(self) -> int:
+        return len(self._active)
+
+    def start(self, profile: Profile):
+        with self._lock:
+            self._active[profile.id] = (profile, asyncio.get_running_loop(), threading.get_ident())
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def stop(self, profile: Profile):
+        """샘플링 중단 (반환 후에는 샘플러가 이 프로파일을 건드리지 않음)"""
+        with self._lock:
+            self._active.pop(profile.id, None)
+            if not self._active:
+                self._wakeup.clear()
+
+    def _run(self):
+        last = time.perf_counter()
+        while True:
+            if not self._wakeup.is_set():
+                self._wakeup.wait()
+                last = time.perf_counter()
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            with self._lock:
+                active = list(self._active.values())
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for profile, loop, thread_id in active:
+                # 복사한 뒤 끝난 요청은 건너뜀, 샘플을 추가하는 동안 stop()이 기다리도록 잠금 유지
+                with self._lock:
+                    if profile.id not in self._active or len(profile.stacks) >= PROFILE_MAX_SAMPLES:
+                        continue
+                    try:
+                        if asyncio.current_task(loop) is profile.task:
+                            stack = _running_stack(frames.get(thread_id), profile.root_frame)
+                        else:
+                            stack = _awaiting_stack(profile.task, profile.root_frame)
+                    except Exception:
+                        # 다른 스레드에서 읽는 중에 코루틴이 진행돼 체인이 바뀐 경우
+                        continue
+                    profile.stacks.append(stack)
+                    # 다른 요청의 샘플링 중에 시작한 프로파일은 시작 이후 시간만
+                    profile.weights.append(min(elapsed, now - profile.started))
+            del frames
+
+
+class ProfileStore:
+    """요청별 프로파일(최근 keep개)과 샘플링 프로파일(가장 느린 keep개)"""
+
+    def __init__(self, keep: int):
+        self.keep = keep
+        self._requested: "deque[Profile]" = deque(maxlen=keep)
+        self._slowest: List[Tuple[float, int, Profile]] = []
+        self._sequence = itertools.count()
+
+    def add(self, profile: Profile):
+        if profile.reason != "sampled":
+            self._requested.append(profile)
+            return
+        item = (profile.duration, next(self._sequence), profile)
+        if len(self._slowest) < self.keep:
+            heapq.heappush(self._slowest, item)
+        elif profile.duration > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, item)
+
+    def list(self) -> List[dict]:
+        profiles = list(self._requested) + [item[2] for item in self._slowest]
+        return [profile.summary() for profile in sorted(profiles, key=lambda p: p.started_at, reverse=True)]
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        for profile in itertools.chain(self._requested, (item[2] for item in self._slowest)):
+            if profile.id == profile_id:
+                return profile
+        return None
+
+    def clear(self):
+        self._requested.clear()
+        self._slowest.clear()
+
+
+sampler = Sampler(PROFILE_INTERVAL)
+profile_store = ProfileStore(PROFILE_KEEP)
+
+
+def _bearer_token(scope: dict) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            return token.strip() if scheme.lower() == "bearer" else None
+    return None
+
+
+async def _requested_reason(scope: dict, header: str) -> Optional[str]:
+    """요청별 프로파일 허용 여부 (비밀값 또는 허용 목록의 데스크 계정)"""
+    if PROFILE_SECRET and hmac.compare_digest(header.encode(), PROFILE_SECRET.encode()):
+        return "secret"
+    if PROFILE_DESK_EMAILS:
+        token = _bearer_token(scope)
+        if token:
+            from auth import verify_google_token
+            try:
+                claims = await verify_google_token(token)
+            except Exception:
+                return None
+            email = (claims.get("email") or "").lower()
+            if email in PROFILE_DESK_EMAILS:
+                return f"user:{email}"
+    return None
+
+
+class ProfilerMiddleware:
+    """X-Profile 요청과 샘플링 대상 요청을 프로파일 (순수 ASGI)"""
+
+    def __init__(self, app, router=None):
+        self.app = app
+        self.router = router
+        self._counters: Dict[Tuple[str, str], int] = {}
+
+    def _sampled(self, scope: dict) -> bool:
+        if PROFILE_SAMPLE_RATE <= 0:
+            return False
+        # 라우팅 전이므로 직접 매칭 (라우트별로 N번째 요청마다)
+        route = UNMATCHED_ROUTE
+        for candidate in self.router.routes if self.router is not None else ():
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                route = candidate.path
+                break
+        key = (scope["method"], route)
+        count = self._counters.get(key, 0)
+        self._counters[key] = count + 1
+        return count % PROFILE_SAMPLE_RATE == 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header = None
+        for name, value in scope["headers"]:
+            if name == _PROFILE_HEADER_KEY:
+                header = value.decode("latin-1")
+                break
+        reason = await _requested_reason(scope, header) if header is not None else None
+        if reason is None and self._sampled(scope):
+            reason = "sampled"
+        if reason is None or sampler.active_count() >= PROFILE_MAX_ACTIVE:
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(scope["method"], scope["path"], reason, asyncio.current_task(), sys._getframe())
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                if reason != "sampled":
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-profile-id", profile.id.encode())
+                    ]
+            await send(message)
+
+        sampler.start(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # stop() 이후에는 샘플이 추가되지 않으므로 그다음에 결과를 확정
+            sampler.stop(profile)
+            profile.duration = time.perf_counter() - profile.started
+            profile.route = route_template(scope)
+            profile.task = None
+            profile.root_frame = None
+            profile_store.add(profile)
+            if reason != "sampled":
+                logger.info(
+                    "Profiled %s %s (%s): %.1f ms, %d samples, id=%s",
+                    profile.method, profile.path, reason, profile.duration * 1000, len(profile.stacks), profile.id
+                )
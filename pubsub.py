@@ -0,0 +1,248 @@
+"""프로세스 내 pub/sub 브로커 + 워커 간 전달 백엔드
+
+발행한 메시지는 백엔드를 거쳐 모든 워커(자기 자신 포함)의 브로커로 전달되고,
+각 브로커가 해당 채널의 로컬 구독자에게 나눠 준다.
+
+- loopback: 같은 프로세스 안에서만 전달 (SQLite 단일 워커, 테스트)
+- postgres: PostgreSQL LISTEN/NOTIFY (워커/인스턴스 간 전달)
+"""
+import asyncio
+import json
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+from database import DATABASE_URL
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 백엔드가 받은 메시지를 브로커에 넘기는 콜백 (채널, JSON 문자열)
+Deliver = Callable[[str, str], None]
+# 백엔드가 끊겼다가 다시 연결됐을 때 부르는 콜백
+Reconnected = Callable[[], None]
+
+
+class LoopbackBackend:
+    """같은 프로세스 안에서만 전달"""
+
+    async def start(self, deliver: Deliver, reconnected: Reconnected):
+        self._deliver = deliver
+
+    async def stop(self):
+        pass
+
+    async def publish_many(self, messages: List[Tuple[str, str]]):
+        for channel, payload in messages:
+            self._deliver(channel, payload)
+
+
+class PostgresBackend:
+    """PostgreSQL LISTEN/NOTIFY로 워커 간 전달
+
+    LISTEN은 세션 단위라 트랜잭션 모드 풀러(pgbouncer)를 거치면 동작하지 않는다.
+    전용 연결 하나로 수신과 발행을 모두 처리하고, 연결이 끊기면(시작 시 연결 실패 포함)
+    백그라운드에서 다시 연결한다. 끊긴 동안의 메시지는 받지 못하므로 다시 연결되면
+    reconnected를 호출한다.
+    """
+
+    NOTIFY_CHANNEL = "mega_schedule_events"
+    # NOTIFY payload 최대 크기 (PostgreSQL 기본 8000 bytes)
+    MAX_PAYLOAD = 7900
+
+    def __init__(self, url: str, reconnect_delay: float = 1.0):
+        # asyncpg는 SQLAlchemy 드라이버 표기(+asyncpg)를 모름
+        self.url = url.replace("postgresql+asyncpg://", "postgresql://", 1)
+        self.reconnect_delay = reconnect_delay
+        self._connection = None
+        self._lock = asyncio.Lock()
+        self._stopping = False
+        self._reconnect_task: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Deliver, reconnected: Reconnected):
+        self._deliver = deliver
+        self._reconnected = reconnected
+        self._stopping = False
+        try:
+            await self._connect()
+        except Exception:
+            logger.warning("Pub/sub connect failed; retrying in background", exc_info=True)
+            self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _connect(self):
+        import asyncpg
+
+        connection = await asyncpg.connect(self.url)
+        await connection.add_listener(self.NOTIFY_CHANNEL, self._on_notify)
+        connection.add_termination_listener(self._on_terminated)
+        self._connection = connection
+        logger.info("Pub/sub listening on PostgreSQL channel %s", self.NOTIFY_CHANNEL)
+
+    def _on_notify(self, connection, pid, notify_channel, payload: str):
+        channel, _, message = payload.partition("\n")
+        self._deliver(channel, message)
+
+    def _on_terminated(self, connection):
+        self._connection = None
+        if not self._stopping and (self._reconnect_task is None or self._reconnect_task.done()):
+            self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self):
+        delay = self.reconnect_delay
+        while not self._stopping:
+            try:
+                await self._connect()
+            except Exception:
+                logger.warning("Pub/sub reconnect failed; retrying in %.0fs", delay, exc_info=True)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+                continue
+            self._reconnected()
+            return
+
+    async def stop(self):
+        self._stopping = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    async def publish_many(self, messages: List[Tuple[str, str]]):
+        """여러 메시지를 한 번의 왕복으로 NOTIFY"""
+        notifications = [f"{channel}\n{payload}" for channel, payload in messages]
+        for notification in notifications:
+            if len(notification.encode()) > self.MAX_PAYLOAD:
+                raise ValueError(f"Pub/sub payload too large for NOTIFY: {len(notification)} bytes")
+        if self._connection is None:
+            raise ConnectionError("Pub/sub backend is not connected")
+        async with self._lock:
+            await self._connection.execute(
+                "SELECT pg_notify($1, payload) FROM unnest($2::text[]) AS payload",
+                self.NOTIFY_CHANNEL,
+                notifications
+            )
+
+
+class Subscription:
+    """구독자 한 명의 메시지 대기열 (처리가 밀리면 overflowed로 끊김 표시)"""
+
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def offer(self, message: dict):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class Broker:
+    """채널별 로컬 구독자에게 메시지를 나눠 주는 브로커"""
+
+    def __init__(self, backend, queue_size: int = 100):
+        self.backend = backend
+        self.queue_size = queue_size
+        self.started = False
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self._listeners: Dict[str, List[Callable[[dict], None]]] = {}
+        self._reconnect_listeners: List[Reconnected] = []
+
+    async def start(self):
+        await self.backend.start(self._deliver, self._reconnected)
+        self.started = True
+
+    async def stop(self):
+        self.started = False
+        await self.backend.stop()
+
+    def _deliver(self, channel: str, payload: str):
+        subscriptions = self._subscriptions.get(channel)
+        listeners = self._listeners.get(channel)
+        if not subscriptions and not listeners:
+            return
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.warning("Dropping malformed pub/sub message on %s", channel)
+            return
+        for subscription in subscriptions or ():
+            subscription.offer(message)
+        for listener in listeners or ():
+            try:
+                listener(message)
+            except Exception:
+                logger.exception("Pub/sub listener failed on %s", channel)
+
+    def _reconnected(self):
+        for listener in self._reconnect_listeners:
+            try:
+                listener()
+            except Exception:
+                logger.exception("Pub/sub reconnect listener failed")
+
+    def add_listener(self, channel: str, listener: Callable[[dict], None]):
+        """채널 메시지를 받을 때마다 호출할 콜백 등록 (프로세스 전체에서 유지)"""
+        self._listeners.setdefault(channel, []).append(listener)
+
+    def add_reconnect_listener(self, listener: Reconnected):
+        """백엔드가 다시 연결될 때마다 호출할 콜백 등록 (끊긴 동안 놓친 메시지 보정)"""
+        self._reconnect_listeners.append(listener)
+
+    async def publish(self, channel: str, message: dict):
+        """메시지 발행 (커밋 후 호출, 실패해도 요청은 성공으로 처리)"""
+        await self.publish_many([(channel, message)])
+
+    async def publish_many(self, messages: List[Tuple[str, dict]]):
+        if not self.started or not messages:
+            return
+        try:
+            await self.backend.publish_many([
+                (channel, json.dumps(message, default=str)) for channel, message in messages
+            ])
+        except Exception:
+            logger.warning("Failed to publish %d message(s)", len(messages), exc_info=True)
+
+    @asynccontextmanager
+    async def subscribe(self, *channels: str) -> AsyncIterator[Subscription]:
+        subscription = Subscription(self.queue_size)
+        for channel in channels:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            for channel in channels:
+                subscribers = self._subscriptions.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscriptions[channel]
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "started": self.started,
+            "channels": len(self._subscriptions),
+            "listeners": sum(len(listeners) for listeners in self._listeners.values()),
+            "subscribers": sum(len(subscribers) for subscribers in self._subscriptions.values()),
+        }
+
+
+def create_backend():
+    # 기본값: PostgreSQL이면 LISTEN/NOTIFY, SQLite면 loopback
+    default = "loopback" if DATABASE_URL.startswith("sqlite") else "postgres"
+    name = os.getenv("PUBSUB_BACKEND", default).lower()
+    if name == "loopback":
+        return LoopbackBackend()
+    if name == "postgres":
+        # 트랜잭션 모드 풀러를 쓰는 경우 직접 연결 URL을 따로 지정
+        return PostgresBackend(os.getenv("PUBSUB_DATABASE_URL") or DATABASE_URL)
+    raise ValueError(f"Unknown PUBSUB_BACKEND: {name}")
+
+
+broker = Broker(create_backend(), queue_size=int(os.getenv("PUBSUB_QUEUE_SIZE", "100")))
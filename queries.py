@@ -0,0 +1,271 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+from sqlalchemy import select, func, and_, case, cast, extract, Integer
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from database import User, Schedule, Class, TeacherMonthRollup, UserRole, AssignmentStatus
+from models import ScheduleResponse
+
+# ScheduleResponse 필드 순서의 스케줄 컬럼 (ORM 객체 없이 행으로 응답을 만들 때)
+SCHEDULE_RESPONSE_COLUMNS = tuple(getattr(Schedule, name) for name in ScheduleResponse.model_fields)
+
+
+class duration_seconds(FunctionElement):
+    """두 시각 사이의 초 (정수, PostgreSQL/SQLite 공용)"""
+    type = Integer()
+    name = "duration_seconds"
+    inherit_cache = True
+
+
+@compiles(duration_seconds)
+def _compile_duration_seconds(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return "CAST(EXTRACT(EPOCH FROM (%s - %s)) AS INTEGER)" % (
+        compiler.process(end, **kw),
+        compiler.process(start, **kw),
+    )
+
+
+@compiles(duration_seconds, "sqlite")
+def _compile_duration_seconds_sqlite(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return "(CAST(strftime('%%s', %s) AS INTEGER) - CAST(strftime('%%s', %s) AS INTEGER))" % (
+        compiler.process(end, **kw),
+        compiler.process(start, **kw),
+    )
+
+
+def available_schedules_query(
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    teacher_ids: Optional[List[int]] = None,
+    min_duration: Optional[int] = None,
+    limit: Optional[int] = None,
+):
+    """선생별 사용 가능한 스케줄 조회 쿼리 (선생 ID, 시작 시간 순)
+
+    (teacher_id, teacher_name, *SCHEDULE_RESPONSE_COLUMNS) 행을 반환한다.
+    min_duration은 분 단위, limit은 선생 수 제한.
+    """
+    conditions = [
+        User.role == UserRole.TEACHER.value,
+        Schedule.is_available == True,
+    ]
+    if start_time:
+        conditions.append(Schedule.start_time >= start_time)
+    if end_time:
+        conditions.append(Schedule.end_time <= end_time)
+    if teacher_ids:
+        conditions.append(Schedule.teacher_id.in_(teacher_ids))
+    if min_duration:
+        conditions.append(
+            duration_seconds(Schedule.start_time, Schedule.end_time) >= min_duration * 60
+        )
+
+    query = (
+        select(User.id, User.name, *SCHEDULE_RESPONSE_COLUMNS)
+        .join(Schedule, Schedule.teacher_id == User.id)
+        .where(*conditions)
+    )
+
+    if limit:
+        # 조건을 만족하는 슬롯이 있는 선생 중 앞에서부터 limit명
+        limited_teachers = (
+            select(Schedule.teacher_id)
+            .join(User, Schedule.teacher_id == User.id)
+            .where(*conditions)
+            .group_by(Schedule.teacher_id)
+            .order_by(Schedule.teacher_id)
+            .limit(limit)
+            .subquery()
+        )
+        query = query.join(limited_teachers, limited_teachers.c.teacher_id == User.id)
+
+    # 메모리 인덱스(availability_index)와 같은 순서
+    return query.order_by(User.id, Schedule.start_time, Schedule.end_time, Schedule.id)
+
+
+def open_slots_query(start_time: datetime, end_time: datetime):
+    """자동 배정 후보 슬롯 쿼리 (배정 가능하고 대기/수락 수업이 없는 슬롯)
+
+    (id, version, teacher_id, teacher_name, start_time, end_time) 행을 시작 시간 순으로 반환한다.
+    """
+    taken = (
+        select(Class.id)
+        .where(
+            Class.schedule_id == Schedule.id,
+            Class.status.in_([AssignmentStatus.PENDING.value, AssignmentStatus.ACCEPTED.value]),
+        )
+        .exists()
+    )
+    return (
+        select(
+            Schedule.id, Schedule.version, Schedule.teacher_id, User.name,
+            Schedule.start_time, Schedule.end_time,
+        )
+        .join(User, Schedule.teacher_id == User.id)
+        .where(
+            User.role == UserRole.TEACHER.value,
+            Schedule.is_available == True,
+            Schedule.start_time >= start_time,
+            Schedule.end_time <= end_time,
+            ~taken,
+        )
+        .order_by(Schedule.start_time, Schedule.id)
+    )
+
+
+def pending_class_slots_query(start_time: datetime, end_time: datetime):
+    """대기 중인 수업의 슬롯 쿼리 (시작 시간이 [start, end) 안)
+
+    (teacher_id, start_time, end_time) 행을 반환한다.
+    """
+    return (
+        select(Class.teacher_id, Schedule.start_time, Schedule.end_time)
+        .join(Schedule, Class.schedule_id == Schedule.id)
+        .where(
+            Class.status == AssignmentStatus.PENDING.value,
+            Schedule.start_time >= start_time,
+            Schedule.start_time < end_time,
+        )
+    )
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """요청 시각을 DB/인덱스와 같은 naive UTC로 (오프셋이 있으면 UTC로 변환)"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def month_range(year: int, month: int):
+    """해당 월의 시작일과 종료일 (종료일은 다음 달 1일)"""
+    start_date = datetime(year, month, 1)
+    if month == 12:
+        end_date = datetime(year + 1, 1, 1)
+    else:
+        end_date = datetime(year, month + 1, 1)
+    return start_date, end_date
+
+
+def worktime_totals_query(year: int, month: int, teacher_id: Optional[int] = None):
+    """선생별 월 근무 합계 쿼리 (teacher_month_rollup 조회)
+
+    (teacher_id, teacher_name, total_minutes, classes_count) 행을 반환한다.
+    수락된 수업이 없는 선생도 0으로 포함된다.
+    """
+    query = (
+        select(
+            User.id,
+            User.name,
+            func.coalesce(TeacherMonthRollup.total_minutes, 0),
+            func.coalesce(TeacherMonthRollup.classes_count, 0),
+        )
+        .outerjoin(
+            TeacherMonthRollup,
+            and_(
+                TeacherMonthRollup.teacher_id == User.id,
+                TeacherMonthRollup.year == year,
+                TeacherMonthRollup.month == month,
+            ),
+        )
+        .where(User.role == UserRole.TEACHER.value)
+    )
+    if teacher_id:
+        query = query.where(User.id == teacher_id)
+    return query.order_by(User.id)
+
+
+def monthly_settlement_query():
+    """원본 테이블 기준 선생/월별 정산 집계 쿼리 (DB에서 GROUP BY로 집계)
+
+    (teacher_id, year, month, total_minutes, classes_count) 행을 반환한다.
+    teacher_month_rollup 재계산/검증에 사용한다.
+    """
+    year = cast(extract("year", Schedule.start_time), Integer)
+    month = cast(extract("month", Schedule.start_time), Integer)
+    return (
+        select(
+            Class.teacher_id,
+            year,
+            month,
+            func.sum(duration_seconds(Schedule.start_time, Schedule.end_time) // 60),
+            func.count(Class.id),
+        )
+        .join(Schedule, Class.schedule_id == Schedule.id)
+        .where(Class.status == AssignmentStatus.ACCEPTED.value)
+        .group_by(Class.teacher_id, year, month)
+    )
+
+
+def settlement_schedules_query(start_date: datetime, end_date: datetime, teacher_id: Optional[int] = None):
+    """정산 대상(수락된 수업) 스케줄 쿼리
+
+    (teacher_id, *SCHEDULE_RESPONSE_COLUMNS) 행을 선생 ID, 시작 시간 순으로 반환한다.
+    """
+    query = (
+        select(Class.teacher_id, *SCHEDULE_RESPONSE_COLUMNS)
+        .join(Schedule, Class.schedule_id == Schedule.id)
+        .where(
+            Class.status == AssignmentStatus.ACCEPTED.value,
+            Schedule.start_time >= start_date,
+            Schedule.start_time < end_date,
+        )
+    )
+    if teacher_id:
+        query = query.where(Class.teacher_id == teacher_id)
+    return query.order_by(Class.teacher_id, Schedule.start_time)
+
+
+def teacher_schedules_query(
+    teacher_id: int,
+    from_time: Optional[datetime] = None,
+    to_time: Optional[datetime] = None
+):
+    """선생 스케줄 기간 조회 쿼리 (시작 시간이 [from, to) 안에 있는 슬롯)
+
+    SCHEDULE_RESPONSE_COLUMNS 행을 시작 시간 순으로 반환한다.
+    """
+    query = select(*SCHEDULE_RESPONSE_COLUMNS).where(Schedule.teacher_id == teacher_id)
+    if from_time:
+        query = query.where(Schedule.start_time >= from_time)
+    if to_time:
+        query = query.where(Schedule.start_time < to_time)
+    return query.order_by(Schedule.start_time)
+
+
+# 한 슬롯에 수업이 여러 개면 accepted > pending > rejected 순으로 대표 상태 선택
+CLASS_STATUS_RANK = {
+    AssignmentStatus.REJECTED.value: 1,
+    AssignmentStatus.PENDING.value: 2,
+    AssignmentStatus.ACCEPTED.value: 3,
+}
+CLASS_STATUS_BY_RANK = {rank: status for status, rank in CLASS_STATUS_RANK.items()}
+
+
+def calendar_slots_query(
+    teacher_id: int,
+    from_time: Optional[datetime] = None,
+    to_time: Optional[datetime] = None
+):
+    """캘린더용 슬롯 쿼리
+
+    (id, start_time, end_time, is_available, class_status_rank) 행을 반환한다.
+    """
+    status_rank = (
+        select(func.max(case(CLASS_STATUS_RANK, value=Class.status)))
+        .where(Class.schedule_id == Schedule.id)
+        .scalar_subquery()
+    )
+    query = select(
+        Schedule.id,
+        Schedule.start_time,
+        Schedule.end_time,
+        Schedule.is_available,
+        status_rank,
+    ).where(Schedule.teacher_id == teacher_id)
+    if from_time:
+        query = query.where(Schedule.start_time >= from_time)
+    if to_time:
+        query = query.where(Schedule.start_time < to_time)
+    return query.order_by(Schedule.start_time)
@@ -0,0 +1,57 @@
+import heapq
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, List, Sequence, Set, Tuple
+
+# (시작, 종료) 슬롯
+Slot = Tuple[datetime, datetime]
+
+
+def expand_weekly(
+    weekdays: Iterable[int],
+    start_time: time,
+    end_time: time,
+    start_date: date,
+    end_date: date,
+    except_dates: Set[date] = frozenset()
+) -> List[Slot]:
+    """주간 반복 규칙을 실제 슬롯 목록으로 펼침 (시작 시간 순, end_date 포함)"""
+    weekday_set = set(weekdays)
+    slots = []
+    day = start_date
+    while day <= end_date:
+        if day.weekday() in weekday_set and day not in except_dates:
+            slots.append((datetime.combine(day, start_time), datetime.combine(day, end_time)))
+        if day == end_date:
+            # date.max 다음 날은 만들 수 없음
+            break
+        day += timedelta(days=1)
+    return slots
+
+
+def find_overlaps(
+    new_slots: Sequence[Slot],
+    existing: Sequence[Tuple[int, datetime, datetime]]
+) -> List[Tuple[int, int]]:
+    """새 슬롯과 기존 슬롯의 겹침을 한 번의 스윕으로 찾음
+
+    new_slots, existing 모두 시작 시간 순으로 정렬되어 있어야 한다.
+    existing은 (schedule_id, 시작, 종료) 목록.
+    (새 슬롯 인덱스, 겹치는 기존 schedule_id) 목록을 반환한다.
+    """
+    overlaps = []
+    active = []  # (종료, 시작, schedule_id) 힙: 지금까지 살펴본 기존 슬롯
+    j = 0
+    for index, (start, end) in enumerate(new_slots):
+        while j < len(existing) and existing[j][1] < end:
+            schedule_id, existing_start, existing_end = existing[j]
+            heapq.heappush(active, (existing_end, existing_start, schedule_id))
+            j += 1
+        # 새 슬롯 시작 시간은 증가하므로 이미 끝난 슬롯은 이후에도 겹치지 않음
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        overlaps.extend(
+            (index, schedule_id)
+            for _, existing_start, schedule_id in active
+            if existing_start < end
+        )
+    return overlaps
@@ -0,0 +1,200 @@
+"""데스크 대시보드 GET 응답 캐시 (인코딩된 JSON 본문)
+
+여러 데스크 직원이 같은 조건으로 계속 새로고침하는 목록을 워커 프로세스 안에서
+공유한다. 항목마다 영향을 받는 선생/월 범위(CacheScope)를 기억하고, 쓰기 요청이
+커밋 후 발행하는 teacher-month / teacher 무효화 키에 해당하는 항목만 지운다.
+
+- LRU + TTL + 전체 본문 크기 제한
+- 같은 키의 동시 미스는 한 번만 계산하고 나머지는 그 결과를 기다림 (single-flight)
+- 계산 중에 무효화되면 결과를 저장하지 않음 (지난 데이터를 저장하지 않도록)
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, NamedTuple, Optional, Set
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def month_number(when: datetime) -> int:
+    return when.year * 12 + when.month - 1
+
+
+class CacheScope(NamedTuple):
+    """응답이 의존하는 선생/월 범위 (None이면 제한 없음)"""
+    teacher_ids: Optional[frozenset]
+    first_month: Optional[int]
+    last_month: Optional[int]
+
+    @classmethod
+    def for_range(cls, teacher_ids: Optional[Iterable[int]], start: Optional[datetime], end: Optional[datetime]):
+        return cls(
+            frozenset(teacher_ids) if teacher_ids else None,
+            month_number(start) if start else None,
+            month_number(end) if end else None,
+        )
+
+    @classmethod
+    def for_month(cls, teacher_id: Optional[int], year: int, month: int):
+        number = year * 12 + month - 1
+        return cls(frozenset([teacher_id]) if teacher_id else None, number, number)
+
+    def covers_month(self, month: Optional[int]) -> bool:
+        if month is None:
+            return True
+        if self.first_month is not None and month < self.first_month:
+            return False
+        if self.last_month is not None and month > self.last_month:
+            return False
+        return True
+
+
+class CacheEntry(NamedTuple):
+    expires_at: float
+    body: bytes
+    scope: CacheScope
+
+
+class Flight:
+    """진행 중인 계산 하나 (같은 키의 요청들이 함께 기다림)"""
+
+    __slots__ = ("future", "scope", "stale")
+
+    def __init__(self, scope: CacheScope):
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.scope = scope
+        self.stale = False
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int = 1000, max_bytes: int = 32 * 1024 * 1024, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        # 선생 ID -> 키 (None: 모든 선생에 의존하는 항목)
+        self._by_teacher: Dict[Optional[int], Set[Hashable]] = {}
+        self._flights: Dict[Hashable, Flight] = {}
+
+    async def get_or_compute(
+        self,
+        key: Hashable,
+        scope: CacheScope,
+        compute: Callable[[], Awaitable[bytes]]
+    ) -> bytes:
+        """캐시된 본문 반환, 없으면 compute()로 만든 본문을 저장"""
+        while True:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.body
+                self._remove(key)
+
+            flight = self._flights.get(key)
+            if flight is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(flight.future)
+            except asyncio.CancelledError:
+                # 먼저 계산하던 요청이 취소됐으면 다시 시도 (이 요청 자체가 취소된 경우는 전파)
+                if not flight.future.cancelled():
+                    raise
+
+        self.misses += 1
+        flight = self._flights[key] = Flight(scope)
+        try:
+            body = await compute()
+        except BaseException as error:
+            if isinstance(error, asyncio.CancelledError):
+                flight.future.cancel()
+            else:
+                flight.future.set_exception(error)
+                # 기다리는 요청이 없어도 "Future exception was never retrieved" 경고가 나지 않도록
+                flight.future.exception()
+            raise
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+        flight.future.set_result(body)
+        if not flight.stale and self.ttl > 0:
+            self._store(key, body, scope)
+        return body
+
+    def _store(self, key: Hashable, body: bytes, scope: CacheScope):
+        if len(body) > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = CacheEntry(time.monotonic() + self.ttl, body, scope)
+        self.bytes += len(body)
+        for teacher_id in scope.teacher_ids or (None,):
+            self._by_teacher.setdefault(teacher_id, set()).add(key)
+        while len(self._entries) > self.maxsize or self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.bytes -= len(entry.body)
+        for teacher_id in entry.scope.teacher_ids or (None,):
+            keys = self._by_teacher.get(teacher_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_teacher[teacher_id]
+
+    def evict(self, teacher_id: int, month: Optional[int] = None):
+        """선생의 해당 월(None이면 전체)에 의존하는 항목 삭제"""
+        keys = self._by_teacher.get(teacher_id, set()) | self._by_teacher.get(None, set())
+        for key in keys:
+            if self._entries[key].scope.covers_month(month):
+                self._remove(key)
+                self.invalidations += 1
+        # 계산 중인 결과는 무효화 이전 데이터일 수 있으므로 저장하지 않고, 새 요청은 다시 계산
+        for key, flight in list(self._flights.items()):
+            scope = flight.scope
+            if (scope.teacher_ids is None or teacher_id in scope.teacher_ids) and scope.covers_month(month):
+                flight.stale = True
+                del self._flights[key]
+
+    def clear(self):
+        self._entries.clear()
+        self._by_teacher.clear()
+        self.bytes = 0
+        for flight in self._flights.values():
+            flight.stale = True
+        self._flights.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+response_cache = ResponseCache(
+    maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "1000")),
+    max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "30")),
+)
@@ -0,0 +1,152 @@
+"""선생별 월 근무시간 집계 (teacher_month_rollup) 관리
+
+수업이 수락되거나 수락된 수업/스케줄이 바뀌면 같은 트랜잭션에서 증분 갱신한다.
+원본 테이블과의 차이 확인 및 재계산:
+
+    python rollup.py verify
+    python rollup.py rebuild
+"""
+import argparse
+import asyncio
+from datetime import datetime
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from database import WriteSessionLocal, TeacherMonthRollup
+from queries import monthly_settlement_query
+
+
+def slot_minutes(start_time: datetime, end_time: datetime) -> int:
+    """슬롯 길이 (분, 원본 재계산과 같은 방식으로 초 단위 절삭 후 계산)"""
+    return int((end_time - start_time).total_seconds()) // 60
+
+
+async def apply_delta(
+    db: AsyncSession,
+    teacher_id: int,
+    start_time: datetime,
+    minutes: int,
+    classes: int
+):
+    """해당 선생/월 집계에 증감 반영 (upsert, 커밋은 호출자가 수행)"""
+    insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(TeacherMonthRollup).values(
+        teacher_id=teacher_id,
+        year=start_time.year,
+        month=start_time.month,
+        total_minutes=minutes,
+        classes_count=classes,
+        updated_at=datetime.utcnow()
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[
+            TeacherMonthRollup.teacher_id,
+            TeacherMonthRollup.year,
+            TeacherMonthRollup.month
+        ],
+        set_={
+            "total_minutes": TeacherMonthRollup.total_minutes + stmt.excluded.total_minutes,
+            "classes_count": TeacherMonthRollup.classes_count + stmt.excluded.classes_count,
+            "updated_at": stmt.excluded.updated_at
+        }
+    )
+    await db.execute(stmt)
+
+
+async def record_accepted(db: AsyncSession, teacher_id: int, start_time: datetime, end_time: datetime):
+    """수업 수락 반영"""
+    await apply_delta(db, teacher_id, start_time, slot_minutes(start_time, end_time), 1)
+
+
+async def record_unaccepted(db: AsyncSession, teacher_id: int, start_time: datetime, end_time: datetime):
+    """수락된 수업 취소/삭제 반영"""
+    await apply_delta(db, teacher_id, start_time, -slot_minutes(start_time, end_time), -1)
+
+
+async def record_schedule_moved(
+    db: AsyncSession,
+    teacher_id: int,
+    old_start: datetime,
+    old_end: datetime,
+    new_start: datetime,
+    new_end: datetime
+):
+    """수락된 수업의 스케줄 시간 변경 반영"""
+    await record_unaccepted(db, teacher_id, old_start, old_end)
+    await record_accepted(db, teacher_id, new_start, new_end)
+
+
+async def compute_drift(db: AsyncSession) -> list:
+    """집계 테이블과 원본 테이블(classes, schedules) 재계산 결과 비교"""
+    expected = {
+        (teacher_id, year, month): (int(total_minutes), int(classes_count))
+        for teacher_id, year, month, total_minutes, classes_count
+        in (await db.execute(monthly_settlement_query())).all()
+    }
+    actual = {
+        (row.teacher_id, row.year, row.month): (row.total_minutes, row.classes_count)
+        for row in (await db.execute(select(TeacherMonthRollup))).scalars().all()
+    }
+
+    drift = []
+    for key in sorted(expected.keys() | actual.keys()):
+        expected_value = expected.get(key, (0, 0))
+        actual_value = actual.get(key, (0, 0))
+        if expected_value != actual_value:
+            teacher_id, year, month = key
+            drift.append({
+                "teacher_id": teacher_id,
+                "year": year,
+                "month": month,
+                "expected_minutes": expected_value[0],
+                "actual_minutes": actual_value[0],
+                "expected_classes": expected_value[1],
+                "actual_classes": actual_value[1]
+            })
+    return drift
+
+
+async def rebuild(db: AsyncSession) -> int:
+    """원본 테이블에서 집계 테이블 전체 재계산 (한 트랜잭션)"""
+    rows = (await db.execute(monthly_settlement_query())).all()
+    await db.execute(delete(TeacherMonthRollup))
+    now = datetime.utcnow()
+    db.add_all([
+        TeacherMonthRollup(
+            teacher_id=teacher_id,
+            year=year,
+            month=month,
+            total_minutes=int(total_minutes),
+            classes_count=int(classes_count),
+            updated_at=now
+        )
+        for teacher_id, year, month, total_minutes, classes_count in rows
+    ])
+    await db.commit()
+    return len(rows)
+
+
+async def main(command: str) -> int:
+    async with WriteSessionLocal() as db:
+        drift = await compute_drift(db)
+        for item in drift:
+            print(
+                "drift teacher={teacher_id} {year}-{month:02d}: "
+                "minutes {actual_minutes} -> {expected_minutes}, "
+                "classes {actual_classes} -> {expected_classes}".format(**item)
+            )
+        print(f"{len(drift)} rollup row(s) drifted")
+
+        if command == "rebuild":
+            count = await rebuild(db)
+            print(f"rebuilt {count} rollup row(s)")
+            return 0
+        return 1 if drift else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="teacher_month_rollup 검증/재계산")
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(args.command)))
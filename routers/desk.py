@@ -1,64 +1,133 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, func
+from sqlalchemy import select, insert, update, and_, func
 from datetime import datetime
-from typing import List
-from database import get_db, User, Schedule, Class, AssignmentStatus
+from typing import List, Optional
+from database import get_db, get_primary_db, get_read_db, engine, write_engine, replica_engine, pool_stats, User, Schedule, Class, AssignmentStatus
 from auth import require_desk
+from user_cache import user_cache
+from availability_index import availability_index
+from response_cache import CacheScope, response_cache
+from fast_json import SCHEDULE_FIELDS, dumps, model_dumps, use_fast_path, schedule_dict, parse_fields, fields_key, project_many, json_response
+from events import DESK_CHANNEL, teacher_channel, publish_class_events, event_stream_response
+from pubsub import broker
+from invalidation import invalidate, invalidation_bus, user_key, teacher_key, teacher_month_key
+from conditional import list_validator, page_validator, is_not_modified, not_modified_response
+from profiler import profile_store
+from concurrency import ConcurrencyConflict, run_with_retry, update_versioned
+from matching import StudentSpec, plan_assignments, load_open_slots, load_base_minutes
+from response_cache import month_number
+from pagination import (
+    NEXT_CURSOR_HEADER, order_classes_newest_first,
+    fetch_class_page, stream_classes_ndjson
+)
+from queries import (
+    available_schedules_query, month_range, naive_utc,
+    worktime_totals_query, settlement_schedules_query
+)
 from models import (
-    ClassCreate, ClassResponse,
+    ClassCreate, ClassResponse, BatchClassResult,
     AvailableTeacherResponse,
+    MatchingPlanRequest, MatchingPlanResponse, MatchingAssignment, MatchingTeacherLoad,
+    MatchingCommitRequest,
     TeacherWorkTimeResponse
 )
 
 router = APIRouter(prefix="/api/desk", tags=["desk"])
 
+# 일괄 배정 한 번에 처리 가능한 최대 항목 수
+MAX_BATCH_SIZE = 500
+# 자동 배정 계획/확정 한 번에 처리 가능한 최대 학생 수
+MAX_MATCHING_STUDENTS = 3000
+
 
 @router.get("/teachers/available", response_model=List[AvailableTeacherResponse])
 async def get_available_teachers(
+    request: Request,
     start_time: datetime = None,
     end_time: datetime = None,
+    teacher_ids: Optional[List[int]] = Query(None),
+    min_duration: Optional[int] = Query(None, ge=1, description="최소 수업 가능 시간 (분)"),
+    limit: Optional[int] = Query(None, ge=1, description="최대 선생 수"),
+    fields: Optional[str] = Query(None, description="응답 필드 (예: teacher_id,available_schedules.start_time)"),
     current_user: User = Depends(require_desk),
     db: AsyncSession = Depends(get_db)
 ):
-    """학원 데스크 - 선생이 가능한 시간 조회 (학생 배정용)"""
-    # 모든 선생 조회
-    teachers_result = await db.execute(
-        select(User).where(User.role == "teacher")
-    )
-    teachers = teachers_result.scalars().all()
+    """학원 데스크 - 선생이 가능한 시간 조회 (학생 배정용, 응답 캐시)"""
+    # 인덱스와 SQL 모두 naive UTC로 비교
+    start_time = naive_utc(start_time)
+    end_time = naive_utc(end_time)
+    teacher_ids = sorted(set(teacher_ids)) if teacher_ids else None
+    fieldset = parse_fields(fields, AvailableTeacherResponse)
+    fast = use_fast_path(fieldset)
     
-    available_teachers = []
+    def encode(available_teachers: list) -> bytes:
+        if fast:
+            return dumps(project_many(available_teachers, fieldset))
+        return model_dumps(List[AvailableTeacherResponse], available_teachers)
     
-    for teacher in teachers:
-        # 해당 선생의 사용 가능한 스케줄 조회
-        query = select(Schedule).where(
-            and_(
-                Schedule.teacher_id == teacher.id,
-                Schedule.is_available == True
-            )
+    async def compute():
+        # 메모리 인덱스로 답할 수 있으면 DB 조회 없이 응답
+        indexed = availability_index.find_available(
+            start_time=start_time,
+            end_time=end_time,
+            teacher_ids=teacher_ids,
+            min_duration=min_duration,
+            limit=limit
         )
+        if indexed is not None:
+            available_teachers = [
+                {
+                    "teacher_id": teacher_id,
+                    "teacher_name": teacher_name,
+                    # 인덱스 스냅샷(SlotSnapshot)을 ScheduleResponse 필드 순서로
+                    "available_schedules": [
+                        {
+                            name: teacher_id if name == "teacher_id" else getattr(slot, name)
+                            for name in SCHEDULE_FIELDS
+                        }
+                        for slot in slots
+                    ]
+                }
+                for teacher_id, teacher_name, slots in indexed
+            ]
+            return encode(available_teachers)
         
-        if start_time:
-            query = query.where(Schedule.start_time >= start_time)
-        if end_time:
-            query = query.where(Schedule.end_time <= end_time)
+        # 선생과 스케줄을 한 번에 조인 조회 (선생 ID, 시작 시간 순으로 스트리밍)
+        query = available_schedules_query(
+            start_time=start_time,
+            end_time=end_time,
+            teacher_ids=teacher_ids,
+            min_duration=min_duration,
+            limit=limit
+        )
+        result = await db.stream(query)
         
-        query = query.order_by(Schedule.start_time)
+        available_teachers = []
+        current = None
         
-        schedules_result = await db.execute(query)
-        schedules = schedules_result.scalars().all()
+        async for teacher_id, teacher_name, *columns in result:
+            if current is None or current["teacher_id"] != teacher_id:
+                current = {
+                    "teacher_id": teacher_id,
+                    "teacher_name": teacher_name,
+                    "available_schedules": []
+                }
+                available_teachers.append(current)
+            current["available_schedules"].append(schedule_dict(columns))
         
-        if schedules:
-            available_teachers.append(
-                AvailableTeacherResponse(
-                    teacher_id=teacher.id,
-                    teacher_name=teacher.name,
-                    available_schedules=list(schedules)
-                )
-            )
+        return encode(available_teachers)
     
-    return available_teachers
+    body = await response_cache.get_or_compute(
+        (request.url.path, start_time, end_time, tuple(teacher_ids or ()), min_duration, limit, fields_key(fieldset), fast),
+        CacheScope.for_range(teacher_ids, start_time, end_time),
+        compute
+    )
+    if fast:
+        return json_response(request, body)
+    return Response(content=body, media_type="application/json")
 
 
 @router.post("/classes", response_model=ClassResponse)
@@ -68,133 +137,421 @@ async def assign_student(
     db: AsyncSession = Depends(get_db)
 ):
     """학원 데스크 - 학생 배정"""
-    # 스케줄 확인
-    schedule_result = await db.execute(
-        select(Schedule).where(Schedule.id == class_data.schedule_id)
-    )
-    schedule = schedule_result.scalar_one_or_none()
+    # 재시도 시 롤백으로 세션 객체가 만료되므로 미리 읽어 둠
+    desk_user_id = current_user.id
     
-    if not schedule:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Schedule not found"
+    async def assign():
+        # 스케줄 확인
+        schedule_result = await db.execute(
+            select(Schedule).where(Schedule.id == class_data.schedule_id)
+        )
+        schedule = schedule_result.scalar_one_or_none()
+        
+        if not schedule:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Schedule not found"
+            )
+        
+        if not schedule.is_available:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Schedule is not available"
+            )
+        
+        # 이미 배정된 수업이 있는지 확인
+        existing_class = await db.execute(
+            select(Class).where(
+                and_(
+                    Class.schedule_id == class_data.schedule_id,
+                    Class.status == AssignmentStatus.ACCEPTED.value
+                )
+            )
         )
+        if existing_class.scalar_one_or_none():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Schedule already has an accepted class"
+            )
+        
+        # 확인한 시점 그대로일 때만 배정 (CAS), 그 사이 바뀌었으면 재시도
+        claimed = await db.execute(
+            update(Schedule)
+            .where(
+                Schedule.id == schedule.id,
+                Schedule.version == schedule.version,
+                Schedule.is_available == True
+            )
+            # 스케줄 자체는 바뀌지 않으므로 updated_at은 유지 (onupdate 방지)
+            .values(version=Schedule.version + 1, updated_at=Schedule.updated_at)
+        )
+        if claimed.rowcount != 1:
+            raise ConcurrencyConflict()
+        
+        # 수업 생성
+        class_obj = Class(
+            student_name=class_data.student_name,
+            teacher_id=schedule.teacher_id,
+            schedule_id=class_data.schedule_id,
+            status=AssignmentStatus.PENDING.value,
+            created_by=desk_user_id
+        )
+        
+        db.add(class_obj)
+        await db.commit()
+        await db.refresh(class_obj)
+        return class_obj, schedule
     
+    class_obj, schedule = await run_with_retry(db, assign)
+    await invalidate(teacher_month_key(schedule.teacher_id, schedule.start_time))
+    await publish_class_events("class_assigned", [class_obj], lambda assigned: teacher_channel(assigned.teacher_id))
+    
+    return class_obj
+
+
+def _assignment_error(schedule: Optional[Schedule], has_accepted_class: bool) -> Optional[str]:
+    """배정 불가 사유 (assign_student와 같은 메시지), 배정 가능하면 None"""
+    if not schedule:
+        return "Schedule not found"
     if not schedule.is_available:
+        return "Schedule is not available"
+    if has_accepted_class:
+        return "Schedule already has an accepted class"
+    return None
+
+
+@router.post("/classes/batch", response_model=List[BatchClassResult])
+async def assign_students_batch(
+    classes_data: List[ClassCreate],
+    current_user: User = Depends(require_desk),
+    db: AsyncSession = Depends(get_db)
+):
+    """학원 데스크 - 학생 일괄 배정 (항목별 성공/실패 반환)"""
+    if len(classes_data) > MAX_BATCH_SIZE:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Schedule is not available"
+            detail=f"Too many items. Maximum is {MAX_BATCH_SIZE}"
         )
     
-    # 이미 배정된 수업이 있는지 확인
-    existing_class = await db.execute(
-        select(Class).where(
-            and_(
-                Class.schedule_id == class_data.schedule_id,
-                Class.status == AssignmentStatus.ACCEPTED.value
+    schedule_ids = {class_data.schedule_id for class_data in classes_data}
+    desk_user_id = current_user.id
+    
+    async def assign_all():
+        # 스케줄과 수락된 수업 여부를 집합 단위로 한 번씩 조회
+        schedules_result = await db.execute(
+            select(Schedule).where(Schedule.id.in_(schedule_ids))
+        )
+        schedules = {schedule.id: schedule for schedule in schedules_result.scalars().all()}
+        
+        accepted_result = await db.execute(
+            select(Class.schedule_id).where(
+                and_(
+                    Class.schedule_id.in_(schedule_ids),
+                    Class.status == AssignmentStatus.ACCEPTED.value
+                )
             )
         )
+        accepted_schedule_ids = set(accepted_result.scalars().all())
+        
+        results = []
+        rows = []
+        row_indexes = []
+        for index, class_data in enumerate(classes_data):
+            schedule = schedules.get(class_data.schedule_id)
+            error = _assignment_error(schedule, class_data.schedule_id in accepted_schedule_ids)
+            if error:
+                results.append(BatchClassResult(index=index, success=False, error=error))
+                continue
+            rows.append({
+                "student_name": class_data.student_name,
+                "teacher_id": schedule.teacher_id,
+                "schedule_id": class_data.schedule_id,
+                "status": AssignmentStatus.PENDING.value,
+                "created_by": desk_user_id
+            })
+            row_indexes.append(index)
+        
+        if rows:
+            # 배정할 스케줄을 읽은 version 그대로일 때만 한 번에 CAS
+            await update_versioned(
+                db, Schedule, [schedules[schedule_id] for schedule_id in {row["schedule_id"] for row in rows}],
+                Schedule.is_available == True,
+                updated_at=Schedule.updated_at
+            )
+            
+            # 한 번의 다중 INSERT ... RETURNING, 한 트랜잭션
+            insert_result = await db.execute(
+                insert(Class).returning(Class, sort_by_parameter_order=True),
+                rows
+            )
+            for index, class_obj in zip(row_indexes, insert_result.scalars().all()):
+                results.append(BatchClassResult(index=index, success=True, assigned_class=class_obj))
+            await db.commit()
+        
+        results.sort(key=lambda item: item.index)
+        return results, [schedules[row["schedule_id"]] for row in rows]
+    
+    results, assigned_schedules = await run_with_retry(db, assign_all)
+    await invalidate(*(
+        teacher_month_key(schedule.teacher_id, schedule.start_time) for schedule in assigned_schedules
+    ))
+    await publish_class_events(
+        "class_assigned",
+        [result.assigned_class for result in results if result.success],
+        lambda assigned: teacher_channel(assigned.teacher_id)
     )
-    if existing_class.scalar_one_or_none():
+    return results
+
+
+@router.post("/matching/plan", response_model=MatchingPlanResponse)
+async def plan_matching(
+    plan_request: MatchingPlanRequest,
+    current_user: User = Depends(require_desk),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """학원 데스크 - 학생 일괄 자동 배정 계획 (저장하지 않음, /matching/commit으로 확정)"""
+    students = plan_request.students
+    if len(students) > MAX_MATCHING_STUDENTS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Schedule already has an accepted class"
+            detail=f"Too many students. Maximum is {MAX_MATCHING_STUDENTS}"
         )
     
-    # 수업 생성
-    class_obj = Class(
-        student_name=class_data.student_name,
-        teacher_id=schedule.teacher_id,
-        schedule_id=class_data.schedule_id,
-        status=AssignmentStatus.PENDING.value,
-        created_by=current_user.id
+    specs = []
+    for student in students:
+        if not student.windows:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Each student needs at least one window"
+            )
+        # 슬롯과 같은 naive UTC로 비교
+        windows = {(naive_utc(window.start_time), naive_utc(window.end_time)) for window in student.windows}
+        if any(start >= end for start, end in windows):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Start time must be before end time"
+            )
+        if student.preferred_only and not student.preferred_teacher_ids:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="preferred_only requires preferred_teacher_ids"
+            )
+        # 같은 조건의 학생이 한 그룹으로 묶이도록 정규화
+        specs.append(StudentSpec(
+            tuple(sorted(windows)),
+            frozenset(student.preferred_teacher_ids),
+            student.preferred_only,
+            student.min_duration or None
+        ))
+    
+    # 지난 슬롯은 배정하지 않음
+    start_time = max(datetime.utcnow(), min(start for spec in specs for start, _ in spec.windows)) if specs else None
+    end_time = max(end for spec in specs for _, end in spec.windows) if specs else None
+    slots = []
+    base_minutes = {}
+    if specs and start_time < end_time:
+        slots = await load_open_slots(db, start_time, end_time)
+        base_minutes = await load_base_minutes(db, month_number(start_time), month_number(end_time))
+    # 계산하는 동안 연결과 트랜잭션을 잡고 있지 않도록 먼저 반환
+    await db.close()
+    
+    # 유량 계산은 CPU 작업이라 이벤트 루프를 막지 않도록 스레드에서
+    plan = await asyncio.to_thread(plan_assignments, specs, slots, base_minutes)
+    
+    return MatchingPlanResponse(
+        assignments=[
+            MatchingAssignment(
+                index=assignment.student_index,
+                student_name=students[assignment.student_index].student_name,
+                schedule_id=assignment.slot.id,
+                version=assignment.slot.version,
+                teacher_id=assignment.slot.teacher_id,
+                teacher_name=assignment.slot.teacher_name,
+                start_time=assignment.slot.start_time,
+                end_time=assignment.slot.end_time,
+                preferred=assignment.preferred
+            )
+            for assignment in plan.assignments
+        ],
+        unmatched=plan.unmatched,
+        teacher_loads=[
+            MatchingTeacherLoad(
+                teacher_id=load.teacher_id,
+                year=load.year,
+                month=load.month,
+                base_hours=round(load.base_minutes / 60, 2),
+                planned_hours=round(load.planned_minutes / 60, 2),
+                planned_classes=load.planned_classes
+            )
+            for load in plan.loads
+        ],
+        open_slots=len(slots),
+        candidate_slots=plan.candidate_edges,
+        cost=plan.cost
     )
+
+
+@router.post("/matching/commit", response_model=List[ClassResponse])
+async def commit_matching(
+    commit_request: MatchingCommitRequest,
+    current_user: User = Depends(require_desk),
+    db: AsyncSession = Depends(get_db)
+):
+    """학원 데스크 - 자동 배정 계획 확정 (전부 대기 중인 수업으로 만들거나 하나도 만들지 않음)"""
+    items = commit_request.assignments
+    if len(items) > MAX_MATCHING_STUDENTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many assignments. Maximum is {MAX_MATCHING_STUDENTS}"
+        )
+    if not items:
+        return []
     
-    db.add(class_obj)
-    await db.commit()
-    await db.refresh(class_obj)
+    schedule_ids = [item.schedule_id for item in items]
+    if len(set(schedule_ids)) != len(schedule_ids):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Duplicate schedule_id in assignments"
+        )
+    desk_user_id = current_user.id
     
-    return class_obj
+    schedules_result = await db.execute(
+        select(Schedule).where(Schedule.id.in_(schedule_ids))
+    )
+    schedules = {schedule.id: schedule for schedule in schedules_result.scalars().all()}
+    if len(schedules) != len(schedule_ids):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Schedule not found"
+        )
+    
+    taken_result = await db.execute(
+        select(Class.schedule_id).where(
+            and_(
+                Class.schedule_id.in_(schedule_ids),
+                Class.status.in_([AssignmentStatus.PENDING.value, AssignmentStatus.ACCEPTED.value])
+            )
+        )
+    )
+    # 계획 이후 배정/변경된 슬롯이 하나라도 있으면 재시도하지 않고 다시 계획하도록 409
+    stale = taken_result.first() is not None or any(
+        schedules[item.schedule_id].version != item.version or not schedules[item.schedule_id].is_available
+        for item in items
+    )
+    try:
+        if stale:
+            raise ConcurrencyConflict()
+        # 계획의 version 그대로일 때만 한 번에 CAS (배정은 스케줄 version을 올리므로 동시 확정도 충돌)
+        await update_versioned(
+            db, Schedule, list(schedules.values()),
+            Schedule.is_available == True,
+            updated_at=Schedule.updated_at
+        )
+        insert_result = await db.execute(
+            insert(Class).returning(Class, sort_by_parameter_order=True),
+            [
+                {
+                    "student_name": item.student_name,
+                    "teacher_id": schedules[item.schedule_id].teacher_id,
+                    "schedule_id": item.schedule_id,
+                    "status": AssignmentStatus.PENDING.value,
+                    "created_by": desk_user_id
+                }
+                for item in items
+            ]
+        )
+        classes = insert_result.scalars().all()
+        await db.commit()
+    except ConcurrencyConflict:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Matching plan is out of date, please plan again"
+        )
+    
+    await invalidate(*{
+        teacher_month_key(schedule.teacher_id, schedule.start_time) for schedule in schedules.values()
+    })
+    await publish_class_events("class_assigned", classes, lambda assigned: teacher_channel(assigned.teacher_id))
+    return classes
 
 
 @router.get("/teachers/schedules", response_model=List[TeacherWorkTimeResponse])
 async def get_all_teacher_schedules(
+    request: Request,
     year: int = None,
     month: int = None,
     teacher_id: int = None,
+    include_schedules: bool = False,
+    fields: Optional[str] = Query(None, description="응답 필드 (예: teacher_id,total_hours,schedules.start_time)"),
     current_user: User = Depends(require_desk),
     db: AsyncSession = Depends(get_db)
 ):
-    """학원 데스크 - 선생들 근무 일정 및 시간 조회"""
+    """학원 데스크 - 선생들 근무 일정 및 시간 조회 (응답 캐시)"""
     now = datetime.utcnow()
     if year is None:
         year = now.year
     if month is None:
         month = now.month
+    fieldset = parse_fields(fields, TeacherWorkTimeResponse)
+    fast = use_fast_path(fieldset)
     
-    # 해당 월의 시작일과 종료일
-    start_date = datetime(year, month, 1)
-    if month == 12:
-        end_date = datetime(year + 1, 1, 1)
-    else:
-        end_date = datetime(year, month + 1, 1)
-    
-    # 선생 조회
-    teachers_query = select(User).where(User.role == "teacher")
-    if teacher_id:
-        teachers_query = teachers_query.where(User.id == teacher_id)
-    
-    teachers_result = await db.execute(teachers_query)
-    teachers = teachers_result.scalars().all()
-    
-    results = []
-    
-    for teacher in teachers:
-        # 해당 선생의 수락된 수업 조회
-        result = await db.execute(
-            select(Class, Schedule)
-            .join(Schedule, Class.schedule_id == Schedule.id)
-            .where(
-                and_(
-                    Class.teacher_id == teacher.id,
-                    Class.status == AssignmentStatus.ACCEPTED.value,
-                    Schedule.start_time >= start_date,
-                    Schedule.start_time < end_date
-                )
-            )
-        )
-        classes_with_schedules = result.all()
+    async def compute():
+        # 해당 월의 시작일과 종료일
+        start_date, end_date = month_range(year, month)
         
-        # 총 근무 시간 계산
-        total_hours = 0.0
-        schedules_list = []
-        
-        for class_obj, schedule in classes_with_schedules:
-            duration = (schedule.end_time - schedule.start_time).total_seconds() / 3600
-            total_hours += duration
-            schedules_list.append(schedule)
+        # 선생별 근무 시간/수업 수는 월별 집계 테이블에서 조회
+        totals_result = await db.execute(
+            worktime_totals_query(year, month, teacher_id)
+        )
+        totals = totals_result.all()
         
-        results.append(
-            TeacherWorkTimeResponse(
-                teacher_id=teacher.id,
-                teacher_name=teacher.name,
-                total_hours=round(total_hours, 2),
-                classes_count=len(classes_with_schedules),
-                schedules=schedules_list
+        # 상세 일정은 요청한 경우에만 한 번의 쿼리로 조회
+        schedules_by_teacher = {}
+        if include_schedules:
+            schedules_result = await db.execute(
+                settlement_schedules_query(start_date, end_date, teacher_id)
             )
-        )
+            for schedule_teacher_id, *columns in schedules_result.all():
+                schedules_by_teacher.setdefault(schedule_teacher_id, []).append(schedule_dict(columns))
+        
+        worktimes = [
+            {
+                "teacher_id": row_teacher_id,
+                "teacher_name": teacher_name,
+                "total_hours": round(total_minutes / 60, 2),
+                "classes_count": classes_count,
+                "schedules": schedules_by_teacher.get(row_teacher_id, [])
+            }
+            for row_teacher_id, teacher_name, total_minutes, classes_count in totals
+        ]
+        if fast:
+            return dumps(project_many(worktimes, fieldset))
+        return model_dumps(List[TeacherWorkTimeResponse], worktimes)
     
-    return results
+    body = await response_cache.get_or_compute(
+        (request.url.path, year, month, teacher_id, include_schedules, fields_key(fieldset), fast),
+        CacheScope.for_month(teacher_id, year, month),
+        compute
+    )
+    if fast:
+        return json_response(request, body)
+    return Response(content=body, media_type="application/json")
 
 
 @router.get("/classes", response_model=List[ClassResponse])
 async def get_all_classes(
+    request: Request,
+    response: Response,
     status_filter: str = None,
     teacher_id: int = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    stream: bool = False,
     current_user: User = Depends(require_desk),
     db: AsyncSession = Depends(get_db)
 ):
-    """학원 데스크 - 모든 수업 조회"""
+    """학원 데스크 - 모든 수업 조회 (If-None-Match가 같으면 304)"""
     query = select(Class)
     
     if status_filter:
@@ -202,10 +559,40 @@ async def get_all_classes(
     if teacher_id:
         query = query.where(Class.teacher_id == teacher_id)
     
-    query = query.order_by(Class.created_at.desc())
+    # 최신순 + (created_at, id) 키셋 커서
+    ordered = order_classes_newest_first(query, cursor)
+    
+    if limit is not None and not stream:
+        # 페이지 요청은 해당 페이지 행만으로 검증자 생성 (전체 집계 생략)
+        validator = await page_validator(
+            db, request, ordered.limit(limit + 1), Class.id, Class.updated_at, "desk"
+        )
+    else:
+        validator = await list_validator(db, request, query, Class.updated_at, "desk")
+    if is_not_modified(request, validator):
+        return not_modified_response(validator)
+    validator.apply(response)
+    query = ordered
+    
+    if stream:
+        # 내보내기용: 전체 목록을 메모리에 올리지 않고 NDJSON으로 스트리밍
+        if limit:
+            query = query.limit(limit)
+        streaming_response = StreamingResponse(
+            stream_classes_ndjson(db, query),
+            media_type="application/x-ndjson"
+        )
+        # 직접 만든 응답에는 주입된 response의 헤더가 합쳐지지 않음
+        validator.apply(streaming_response)
+        return streaming_response
+    
+    if limit is None:
+        result = await db.execute(query)
+        return result.scalars().all()
     
-    result = await db.execute(query)
-    classes = result.scalars().all()
+    classes, next_cursor = await fetch_class_page(db, query, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return classes
 
 
@@ -236,5 +623,94 @@ async def update_user_role(
     await db.commit()
     await db.refresh(user)
     
+    # 이전 역할로 권한 검사하지 않도록 즉시 무효화
+    user_cache.invalidate(user.id)
+    if new_role == "teacher":
+        await availability_index.load_teacher(db, user.id)
+    else:
+        availability_index.remove_teacher(user.id)
+    await invalidate(user_key(user.id), teacher_key(user.id))
+    
     return {"message": "User role updated successfully", "user": user}
 
+
+@router.get("/events")
+async def stream_desk_events(
+    current_user: User = Depends(require_desk),
+    db: AsyncSession = Depends(get_db)
+):
+    """학원 데스크 - 선생 수락/거절 알림 스트림 (SSE)"""
+    # 스트림이 열려 있는 동안 DB 연결을 잡고 있지 않도록 인증에 쓴 세션 정리
+    await db.close()
+    return event_stream_response([DESK_CHANNEL])
+
+
+@router.get("/availability-index/check")
+async def check_availability_index(
+    repair: bool = False,
+    current_user: User = Depends(require_desk),
+    db: AsyncSession = Depends(get_primary_db)
+):
+    """학원 데스크 - 가능 시간 메모리 인덱스와 DB 비교 (repair=true면 다시 적재)"""
+    if repair:
+        await availability_index.load(db)
+    return await availability_index.check(db)
+
+
+@router.get("/cache/stats")
+async def get_cache_stats(
+    current_user: User = Depends(require_desk)
+):
+    """학원 데스크 - 캐시 적중률 조회"""
+    return {
+        "user_cache": user_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "invalidation": invalidation_bus.stats(),
+        "pubsub": broker.stats()
+    }
+
+
+@router.get("/db/pool")
+async def get_db_pool_stats(
+    current_user: User = Depends(require_desk)
+):
+    """학원 데스크 - DB 커넥션 풀 상태 조회 (워커 프로세스 단위)"""
+    pools = {"primary": pool_stats(engine)}
+    if write_engine is not engine:
+        pools["writer"] = pool_stats(write_engine)
+    if replica_engine is not None:
+        pools["replica"] = pool_stats(replica_engine)
+    return pools
+
+
+@router.get("/profiles")
+async def list_profiles(
+    current_user: User = Depends(require_desk)
+):
+    """학원 데스크 - 저장된 요청 프로파일 목록 (워커 프로세스 단위, 최신순)"""
+    return profile_store.list()
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(
+    request: Request,
+    profile_id: str,
+    format: str = Query("speedscope", pattern="^(speedscope|collapsed)$"),
+    current_user: User = Depends(require_desk)
+):
+    """학원 데스크 - 프로파일 다운로드 (speedscope JSON 또는 collapsed stack)"""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    
+    if format == "collapsed":
+        response = Response(profile.collapsed(), media_type="text/plain")
+        filename = f"{profile.id}.collapsed.txt"
+    else:
+        response = json_response(request, dumps(profile.speedscope()))
+        filename = f"{profile.id}.speedscope.json"
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
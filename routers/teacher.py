@@ -1,18 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_
+from sqlalchemy import select, insert, update, func, and_, or_
 from datetime import datetime, timedelta
-from typing import List
-from database import get_db, User, Schedule, Class, AssignmentStatus
+from typing import List, Optional
+from database import get_db, User, Schedule, Class, TeacherMonthRollup, AssignmentStatus
 from auth import require_teacher
+from pagination import (
+    NEXT_CURSOR_HEADER, order_classes_newest_first,
+    fetch_class_page, stream_classes_ndjson
+)
+from queries import (
+    month_range, naive_utc, settlement_schedules_query,
+    teacher_schedules_query, calendar_slots_query, CLASS_STATUS_BY_RANK
+)
+from rollup import record_accepted, apply_delta, slot_minutes
+from recurrence import expand_weekly, find_overlaps
+from availability_index import availability_index
+from events import DESK_CHANNEL, teacher_channel, publish_class_events, event_stream_response
+from invalidation import invalidate, schedule_key, teacher_month_key
+from conditional import list_validator, page_validator, is_not_modified, not_modified_response
+from fast_json import dumps, schedule_dict, parse_fields, project, project_many, json_response, use_fast_path
+from concurrency import run_with_retry, update_versioned
 from models import (
-    ScheduleCreate, ScheduleResponse,
-    ClassResponse, ClassAcceptRequest,
+    ScheduleCreate, ScheduleResponse, CalendarSlotResponse,
+    RecurringScheduleCreate, RecurringScheduleResult, ScheduleConflict,
+    ClassResponse, ClassAcceptRequest, ClassDecision, ClassDecisionResult,
     TeacherWorkTimeResponse
 )
 
 router = APIRouter(prefix="/api/teacher", tags=["teacher"])
 
+# 반복 일정 한 번에 등록 가능한 최대 슬롯 수
+MAX_RECURRING_SLOTS = 400
+# 반복 일정 최대 기간 (일, 매주 하루만 골라도 MAX_RECURRING_SLOTS를 넘는 길이)
+MAX_RECURRING_DAYS = MAX_RECURRING_SLOTS * 7
+
+# 일괄 수락/거절 한 번에 처리 가능한 최대 항목 수
+MAX_DECISIONS = 200
+
 
 @router.post("/schedules", response_model=ScheduleResponse)
 async def create_schedule(
@@ -21,12 +47,36 @@ async def create_schedule(
     db: AsyncSession = Depends(get_db)
 ):
     """선생 - 본인 일정 등록"""
+    # 인덱스와 SQL 모두 naive UTC로 비교
+    schedule_data.start_time = naive_utc(schedule_data.start_time)
+    schedule_data.end_time = naive_utc(schedule_data.end_time)
     if schedule_data.start_time >= schedule_data.end_time:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Start time must be before end time"
         )
     
+    # 기존 일정과 겹침 확인 (인덱스가 준비되지 않았으면 SQL)
+    overlapping_ids = availability_index.find_overlaps(
+        current_user.id, schedule_data.start_time, schedule_data.end_time
+    )
+    if overlapping_ids is None:
+        overlap_result = await db.execute(
+            select(Schedule.id).where(
+                and_(
+                    Schedule.teacher_id == current_user.id,
+                    Schedule.start_time < schedule_data.end_time,
+                    Schedule.end_time > schedule_data.start_time
+                )
+            )
+        )
+        overlapping_ids = overlap_result.scalars().all()
+    if overlapping_ids:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Schedule overlaps with existing schedules"
+        )
+    
     schedule = Schedule(
         teacher_id=current_user.id,
         start_time=schedule_data.start_time,
@@ -37,41 +87,228 @@ async def create_schedule(
     db.add(schedule)
     await db.commit()
     await db.refresh(schedule)
+    availability_index.upsert(schedule, current_user.name)
+    await invalidate(schedule_key(schedule.id), teacher_month_key(schedule.teacher_id, schedule.start_time))
     
     return schedule
 
 
+@router.post("/schedules/recurring", response_model=RecurringScheduleResult)
+async def create_recurring_schedules(
+    recurrence: RecurringScheduleCreate,
+    current_user: User = Depends(require_teacher),
+    db: AsyncSession = Depends(get_db)
+):
+    """선생 - 주간 반복 일정 일괄 등록"""
+    if recurrence.start_time >= recurrence.end_time:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Start time must be before end time"
+        )
+    if recurrence.start_date > recurrence.end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Start date must not be after end date"
+        )
+    if (recurrence.end_date - recurrence.start_date).days >= MAX_RECURRING_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Date range too long. Maximum is {MAX_RECURRING_DAYS} days"
+        )
+    if not recurrence.weekdays or any(day < 0 or day > 6 for day in recurrence.weekdays):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Weekdays must be between 0 (Monday) and 6 (Sunday)"
+        )
+    
+    slots = expand_weekly(
+        recurrence.weekdays,
+        recurrence.start_time,
+        recurrence.end_time,
+        recurrence.start_date,
+        recurrence.end_date,
+        set(recurrence.except_dates)
+    )
+    if len(slots) > MAX_RECURRING_SLOTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many slots ({len(slots)}). Maximum is {MAX_RECURRING_SLOTS}"
+        )
+    if not slots:
+        return RecurringScheduleResult(created=[], conflicts=[])
+    
+    # 기간 내 기존 일정을 한 번에 조회해서 겹침 확인
+    existing_result = await db.execute(
+        select(Schedule.id, Schedule.start_time, Schedule.end_time)
+        .where(
+            and_(
+                Schedule.teacher_id == current_user.id,
+                Schedule.start_time < slots[-1][1],
+                Schedule.end_time > slots[0][0]
+            )
+        )
+        .order_by(Schedule.start_time)
+    )
+    overlaps = find_overlaps(slots, existing_result.all())
+    conflicts = [
+        ScheduleConflict(
+            start_time=slots[index][0],
+            end_time=slots[index][1],
+            existing_schedule_id=schedule_id
+        )
+        for index, schedule_id in overlaps
+    ]
+    
+    if conflicts and not recurrence.skip_conflicts:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": "Schedule overlaps with existing schedules",
+                "conflicts": [conflict.model_dump(mode="json") for conflict in conflicts]
+            }
+        )
+    
+    conflicting = {index for index, _ in overlaps}
+    rows = [
+        {
+            "teacher_id": current_user.id,
+            "start_time": start,
+            "end_time": end,
+            "is_available": recurrence.is_available
+        }
+        for index, (start, end) in enumerate(slots)
+        if index not in conflicting
+    ]
+    
+    created = []
+    if rows:
+        # 한 번의 다중 INSERT ... RETURNING, 한 트랜잭션
+        result = await db.execute(insert(Schedule).returning(Schedule), rows)
+        created = result.scalars().all()
+        await db.commit()
+        availability_index.upsert_many(created, current_user.name)
+        await invalidate(
+            *(schedule_key(schedule.id) for schedule in created),
+            *(teacher_month_key(schedule.teacher_id, schedule.start_time) for schedule in created)
+        )
+    
+    return RecurringScheduleResult(created=created, conflicts=conflicts)
+
+
 @router.get("/schedules", response_model=List[ScheduleResponse])
 async def get_my_schedules(
+    request: Request,
+    response: Response,
+    from_time: Optional[datetime] = Query(None, alias="from"),
+    to_time: Optional[datetime] = Query(None, alias="to"),
+    fields: Optional[str] = Query(None, description="응답 필드 (예: id,start_time,end_time)"),
     current_user: User = Depends(require_teacher),
     db: AsyncSession = Depends(get_db)
 ):
-    """선생 - 본인 일정 조회"""
+    """선생 - 본인 일정 조회 (If-None-Match가 같으면 304)"""
+    fieldset = parse_fields(fields, ScheduleResponse)
+    query = teacher_schedules_query(current_user.id, from_time, to_time)
+    validator = await list_validator(db, request, query, Schedule.updated_at, current_user.id)
+    if is_not_modified(request, validator):
+        return not_modified_response(validator)
+    
+    result = await db.execute(query)
+    schedules = [schedule_dict(row) for row in result.all()]
+    if not use_fast_path(fieldset):
+        validator.apply(response)
+        return schedules
+    
+    fast_response = json_response(request, dumps(project_many(schedules, fieldset)))
+    validator.apply(fast_response)
+    return fast_response
+
+
+@router.get("/schedules/calendar", response_model=List[CalendarSlotResponse])
+async def get_my_calendar(
+    from_time: Optional[datetime] = Query(None, alias="from"),
+    to_time: Optional[datetime] = Query(None, alias="to"),
+    current_user: User = Depends(require_teacher),
+    db: AsyncSession = Depends(get_db)
+):
+    """선생 - 캘린더용 일정 조회 (표시에 필요한 필드만)"""
     result = await db.execute(
-        select(Schedule)
-        .where(Schedule.teacher_id == current_user.id)
-        .order_by(Schedule.start_time)
+        calendar_slots_query(current_user.id, from_time, to_time)
     )
-    schedules = result.scalars().all()
-    return schedules
+    return [
+        CalendarSlotResponse(
+            id=schedule_id,
+            start_time=start_time,
+            end_time=end_time,
+            is_available=is_available,
+            class_status=CLASS_STATUS_BY_RANK.get(status_rank)
+        )
+        for schedule_id, start_time, end_time, is_available, status_rank in result.all()
+    ]
+
+
+@router.get("/events")
+async def stream_my_events(
+    current_user: User = Depends(require_teacher),
+    db: AsyncSession = Depends(get_db)
+):
+    """선생 - 새 수업 배정 알림 스트림 (SSE)"""
+    channel = teacher_channel(current_user.id)
+    # 스트림이 열려 있는 동안 DB 연결을 잡고 있지 않도록 인증에 쓴 세션 정리
+    await db.close()
+    return event_stream_response([channel])
 
 
 @router.get("/classes", response_model=List[ClassResponse])
 async def get_my_classes(
+    request: Request,
+    response: Response,
     status_filter: str = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    stream: bool = False,
     current_user: User = Depends(require_teacher),
     db: AsyncSession = Depends(get_db)
 ):
-    """선생 - 배정된 수업 확인"""
+    """선생 - 배정된 수업 확인 (If-None-Match가 같으면 304)"""
     query = select(Class).where(Class.teacher_id == current_user.id)
     
     if status_filter:
         query = query.where(Class.status == status_filter)
     
-    query = query.order_by(Class.created_at.desc())
+    # 최신순 + (created_at, id) 키셋 커서
+    ordered = order_classes_newest_first(query, cursor)
     
-    result = await db.execute(query)
-    classes = result.scalars().all()
+    if limit is not None and not stream:
+        # 페이지 요청은 해당 페이지 행만으로 검증자 생성 (전체 집계 생략)
+        validator = await page_validator(
+            db, request, ordered.limit(limit + 1), Class.id, Class.updated_at, current_user.id
+        )
+    else:
+        validator = await list_validator(db, request, query, Class.updated_at, current_user.id)
+    if is_not_modified(request, validator):
+        return not_modified_response(validator)
+    validator.apply(response)
+    query = ordered
+    
+    if stream:
+        # 내보내기용: 전체 목록을 메모리에 올리지 않고 NDJSON으로 스트리밍
+        if limit:
+            query = query.limit(limit)
+        streaming_response = StreamingResponse(
+            stream_classes_ndjson(db, query),
+            media_type="application/x-ndjson"
+        )
+        # 직접 만든 응답에는 주입된 response의 헤더가 합쳐지지 않음
+        validator.apply(streaming_response)
+        return streaming_response
+    
+    if limit is None:
+        result = await db.execute(query)
+        return result.scalars().all()
+    
+    classes, next_cursor = await fetch_class_page(db, query, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return classes
 
 
@@ -103,47 +340,192 @@ async def accept_class(
     db: AsyncSession = Depends(get_db)
 ):
     """선생 - 대기 중 수업 수락/거절"""
-    result = await db.execute(
-        select(Class)
-        .where(
-            and_(
-                Class.id == class_id,
-                Class.teacher_id == current_user.id,
-                Class.status == AssignmentStatus.PENDING.value
+    # 재시도 시 롤백으로 세션 객체가 만료되므로 미리 읽어 둠
+    teacher_id, teacher_name = current_user.id, current_user.name
+    
+    async def decide():
+        result = await db.execute(
+            select(Class)
+            .where(
+                and_(
+                    Class.id == class_id,
+                    Class.teacher_id == teacher_id,
+                    Class.status == AssignmentStatus.PENDING.value
+                )
             )
         )
-    )
-    class_obj = result.scalar_one_or_none()
+        class_obj = result.scalar_one_or_none()
+        
+        if not class_obj:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Class not found or not pending"
+            )
+        
+        schedule = None
+        if request.accept:
+            # 스케줄을 사용 불가능으로 변경
+            schedule_result = await db.execute(
+                select(Schedule).where(Schedule.id == class_obj.schedule_id)
+            )
+            schedule = schedule_result.scalar_one()
+            if not schedule.is_available:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Schedule is not available"
+                )
+            
+            class_obj.status = AssignmentStatus.ACCEPTED.value
+            class_obj.accepted_at = datetime.utcnow()
+            schedule.is_available = False
+            
+            # 월별 근무시간 집계도 같은 트랜잭션에서 갱신
+            await record_accepted(db, class_obj.teacher_id, schedule.start_time, schedule.end_time)
+        else:
+            class_obj.status = AssignmentStatus.REJECTED.value
+        
+        # flush 시 version 조건으로 UPDATE, 다른 요청이 먼저 바꿨으면 StaleDataError
+        await db.commit()
+        await db.refresh(class_obj)
+        return class_obj, schedule
+    
+    class_obj, schedule = await run_with_retry(db, decide)
+    
+    if schedule is not None:
+        availability_index.upsert(schedule, teacher_name)
+        await invalidate(schedule_key(schedule.id), teacher_month_key(teacher_id, schedule.start_time))
+    await publish_class_events("class_decided", [class_obj], lambda decided: DESK_CHANNEL)
     
-    if not class_obj:
+    return class_obj
+
+
+@router.post("/classes/decisions", response_model=List[ClassDecisionResult])
+async def decide_classes(
+    decisions: List[ClassDecision],
+    current_user: User = Depends(require_teacher),
+    db: AsyncSession = Depends(get_db)
+):
+    """선생 - 대기 중 수업 일괄 수락/거절"""
+    if len(decisions) > MAX_DECISIONS:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Class not found or not pending"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many decisions. Maximum is {MAX_DECISIONS}"
         )
     
-    if request.accept:
-        class_obj.status = AssignmentStatus.ACCEPTED.value
-        class_obj.accepted_at = datetime.utcnow()
+    class_ids = {decision.class_id for decision in decisions}
+    teacher_id, teacher_name = current_user.id, current_user.name
+    
+    async def decide_all():
+        # 대상 수업과 스케줄을 한 번씩 조회
+        classes_result = await db.execute(
+            select(Class).where(
+                and_(
+                    Class.id.in_(class_ids),
+                    Class.teacher_id == teacher_id,
+                    Class.status == AssignmentStatus.PENDING.value
+                )
+            )
+        )
+        classes = {class_obj.id: class_obj for class_obj in classes_result.scalars().all()}
         
-        # 스케줄을 사용 불가능으로 변경
-        schedule_result = await db.execute(
-            select(Schedule).where(Schedule.id == class_obj.schedule_id)
+        schedules_result = await db.execute(
+            select(Schedule).where(
+                Schedule.id.in_({class_obj.schedule_id for class_obj in classes.values()})
+            )
         )
-        schedule = schedule_result.scalar_one()
-        schedule.is_available = False
-    else:
-        class_obj.status = AssignmentStatus.REJECTED.value
+        schedules = {schedule.id: schedule for schedule in schedules_result.scalars().all()}
+        
+        outcomes = []  # (class_id, 실패 사유 또는 None), 요청 순서
+        accept_ids = []
+        reject_ids = []
+        seen = set()
+        booked_schedule_ids = set()
+        for decision in decisions:
+            class_obj = classes.get(decision.class_id)
+            if decision.class_id in seen:
+                outcomes.append((decision.class_id, "Duplicate class_id in request"))
+                continue
+            seen.add(decision.class_id)
+            if not class_obj:
+                outcomes.append((decision.class_id, "Class not found or not pending"))
+                continue
+            if decision.accept:
+                schedule = schedules[class_obj.schedule_id]
+                # 같은 스케줄의 수업을 두 개 수락하지 않도록 확인
+                if not schedule.is_available or schedule.id in booked_schedule_ids:
+                    outcomes.append((decision.class_id, "Schedule is not available"))
+                    continue
+                booked_schedule_ids.add(schedule.id)
+                accept_ids.append(class_obj.id)
+            else:
+                reject_ids.append(class_obj.id)
+            outcomes.append((decision.class_id, None))
+        
+        # 읽은 version 그대로인 행만 갱신 (CAS), 하나라도 어긋나면 롤백 후 재시도
+        now = datetime.utcnow()
+        if accept_ids:
+            await update_versioned(
+                db, Class, [classes[class_id] for class_id in accept_ids],
+                Class.status == AssignmentStatus.PENDING.value,
+                status=AssignmentStatus.ACCEPTED.value, accepted_at=now, updated_at=now
+            )
+            await update_versioned(
+                db, Schedule, [schedules[schedule_id] for schedule_id in booked_schedule_ids],
+                Schedule.is_available == True,
+                is_available=False, updated_at=now
+            )
+            
+            # 월별 근무시간 집계는 선생/월 단위로 모아서 반영
+            deltas = {}
+            for class_id in accept_ids:
+                schedule = schedules[classes[class_id].schedule_id]
+                key = (schedule.start_time.year, schedule.start_time.month)
+                minutes, count = deltas.get(key, (0, 0))
+                deltas[key] = (minutes + slot_minutes(schedule.start_time, schedule.end_time), count + 1)
+            for (year, month), (minutes, count) in deltas.items():
+                await apply_delta(db, teacher_id, datetime(year, month, 1), minutes, count)
+        
+        if reject_ids:
+            await update_versioned(
+                db, Class, [classes[class_id] for class_id in reject_ids],
+                Class.status == AssignmentStatus.PENDING.value,
+                status=AssignmentStatus.REJECTED.value, updated_at=now
+            )
+        
+        await db.commit()
+        return classes, schedules, booked_schedule_ids, outcomes
     
-    await db.commit()
-    await db.refresh(class_obj)
+    classes, schedules, booked_schedule_ids, outcomes = await run_with_retry(db, decide_all)
+    booked = [schedules[schedule_id] for schedule_id in booked_schedule_ids]
+    availability_index.upsert_many(booked, teacher_name)
+    await invalidate(
+        *(schedule_key(schedule.id) for schedule in booked),
+        *(teacher_month_key(teacher_id, schedule.start_time) for schedule in booked)
+    )
+    await publish_class_events(
+        "class_decided",
+        [classes[class_id] for class_id, error in outcomes if error is None],
+        lambda decided: DESK_CHANNEL
+    )
     
-    return class_obj
+    return [
+        ClassDecisionResult(
+            class_id=class_id,
+            success=error is None,
+            decided_class=classes[class_id] if error is None else None,
+            error=error
+        )
+        for class_id, error in outcomes
+    ]
 
 
 @router.get("/worktime", response_model=TeacherWorkTimeResponse)
 async def get_monthly_worktime(
+    request: Request,
     year: int = None,
     month: int = None,
+    include_schedules: bool = True,
+    fields: Optional[str] = Query(None, description="응답 필드 (예: total_hours,schedules.start_time)"),
     current_user: User = Depends(require_teacher),
     db: AsyncSession = Depends(get_db)
 ):
@@ -154,44 +536,33 @@ async def get_monthly_worktime(
     if month is None:
         month = now.month
     
+    fieldset = parse_fields(fields, TeacherWorkTimeResponse)
+    
     # 해당 월의 시작일과 종료일
-    start_date = datetime(year, month, 1)
-    if month == 12:
-        end_date = datetime(year + 1, 1, 1)
-    else:
-        end_date = datetime(year, month + 1, 1)
+    start_date, end_date = month_range(year, month)
     
-    # 수락된 수업 조회
-    result = await db.execute(
-        select(Class, Schedule)
-        .join(Schedule, Class.schedule_id == Schedule.id)
-        .where(
-            and_(
-                Class.teacher_id == current_user.id,
-                Class.status == AssignmentStatus.ACCEPTED.value,
-                Schedule.start_time >= start_date,
-                Schedule.start_time < end_date
-            )
-        )
-    )
-    classes_with_schedules = result.all()
+    # 근무 시간/수업 수는 월별 집계 테이블에서 기본키로 조회
+    rollup = await db.get(TeacherMonthRollup, (current_user.id, year, month))
+    total_minutes = rollup.total_minutes if rollup else 0
+    classes_count = rollup.classes_count if rollup else 0
     
-    # 총 근무 시간 계산
-    total_hours = 0.0
     schedules_list = []
+    if include_schedules:
+        schedules_result = await db.execute(
+            settlement_schedules_query(start_date, end_date, current_user.id)
+        )
+        schedules_list = [schedule_dict(columns) for _, *columns in schedules_result.all()]
     
-    for class_obj, schedule in classes_with_schedules:
-        duration = (schedule.end_time - schedule.start_time).total_seconds() / 3600
-        total_hours += duration
-        schedules_list.append(schedule)
-    
-    return TeacherWorkTimeResponse(
-        teacher_id=current_user.id,
-        teacher_name=current_user.name,
-        total_hours=round(total_hours, 2),
-        classes_count=len(classes_with_schedules),
-        schedules=schedules_list
-    )
+    worktime = {
+        "teacher_id": current_user.id,
+        "teacher_name": current_user.name,
+        "total_hours": round(total_minutes / 60, 2),
+        "classes_count": classes_count,
+        "schedules": schedules_list
+    }
+    if not use_fast_path(fieldset):
+        return worktime
+    return json_response(request, dumps(project(worktime, fieldset)))
 
 
 @router.delete("/schedules/{schedule_id}")
@@ -227,8 +598,11 @@ async def delete_schedule(
             detail="Cannot delete schedule with assigned classes"
         )
     
-    db.delete(schedule)
+    teacher_id, start_time = schedule.teacher_id, schedule.start_time
+    await db.delete(schedule)
     await db.commit()
+    availability_index.remove(schedule_id)
+    await invalidate(schedule_key(schedule_id), teacher_month_key(teacher_id, start_time))
     
     return {"message": "Schedule deleted successfully"}
 
@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+from google.auth import jwt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+# 공개키 조회 함수: ({key id: x509 인증서}, max-age 초) 반환
+KeyFetcher = Callable[[], Awaitable[Tuple[Dict[str, str], int]]]
+
+DEFAULT_CERTS_MAX_AGE = 3600
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+def parse_max_age(cache_control: Optional[str], default: int = DEFAULT_CERTS_MAX_AGE) -> int:
+    """Cache-Control 헤더에서 max-age 추출"""
+    if not cache_control:
+        return default
+    match = _MAX_AGE_RE.search(cache_control)
+    return int(match.group(1)) if match else default
+
+
+async def fetch_google_certs() -> Tuple[Dict[str, str], int]:
+    """Google 공개키(x509 인증서) 조회"""
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        response = await client.get(GOOGLE_CERTS_URL)
+        response.raise_for_status()
+    return response.json(), parse_max_age(response.headers.get("cache-control"))
+
+
+class GoogleKeyCache:
+    """프로세스 단위 Google 공개키 캐시
+
+    Cache-Control max-age 동안 키를 재사용하고, 만료가 가까워지면
+    요청을 막지 않고 백그라운드에서 갱신한다.
+    """
+
+    def __init__(
+        self,
+        fetcher: KeyFetcher = fetch_google_certs,
+        refresh_margin: int = 300,
+        min_forced_refresh_interval: int = 30,
+    ):
+        self.fetcher = fetcher
+        self.refresh_margin = refresh_margin
+        self.min_forced_refresh_interval = min_forced_refresh_interval
+        self._certs: Dict[str, str] = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def clear(self):
+        self._certs = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+
+    async def get_certs(self, kid: Optional[str] = None) -> Dict[str, str]:
+        """공개키 조회 (kid가 캐시에 없으면 키 교체로 보고 한 번 강제 갱신)"""
+        now = time.monotonic()
+        if not self._certs:
+            await self._refresh()
+        elif now >= self._expires_at:
+            try:
+                await self._refresh()
+            except Exception as e:
+                # 갱신 실패 시 만료된 키로라도 계속 검증 (Google 장애 대비)
+                logger.warning("Google certs refresh failed, using stale keys: %s", e)
+        elif now >= self._expires_at - self.refresh_margin:
+            self._schedule_refresh()
+
+        if kid is not None and kid not in self._certs:
+            # 임의의 kid로 Google을 두드리지 않도록 강제 갱신 간격 제한
+            if time.monotonic() - self._fetched_at >= self.min_forced_refresh_interval:
+                await self._refresh(force=True)
+        return self._certs
+
+    def _schedule_refresh(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.get_running_loop().create_task(
+                self._background_refresh()
+            )
+
+    async def _background_refresh(self):
+        try:
+            await self._refresh()
+        except Exception as e:
+            # 기존 키가 아직 유효하므로 다음 요청에서 다시 시도
+            logger.warning("Google certs background refresh failed: %s", e)
+
+    async def _refresh(self, force: bool = False):
+        fetched_before = self._fetched_at
+        async with self._lock:
+            # 대기하는 동안 다른 요청이 이미 갱신했으면 재사용
+            if self._fetched_at != fetched_before:
+                return
+            if not force and self._certs and time.monotonic() < self._expires_at - self.refresh_margin:
+                return
+            certs, max_age = await self.fetcher()
+            now = time.monotonic()
+            self._certs = dict(certs)
+            self._fetched_at = now
+            self._expires_at = now + max_age
+
+
+class VerifiedTokenCache:
+    """검증이 끝난 토큰의 LRU 캐시 (토큰 해시 키, 토큰 exp에 만료)"""
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        idinfo, exp = entry
+        if exp <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return idinfo
+
+    def put(self, token: str, idinfo: dict):
+        exp = float(idinfo.get("exp", 0))
+        if exp <= time.time():
+            return
+        key = self._key(token)
+        self._entries[key] = (idinfo, exp)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class GoogleTokenVerifier:
+    """Google ID 토큰 검증기
+
+    서명 검증(RSA)은 이벤트 루프를 막지 않도록 스레드에서 수행한다.
+    """
+
+    def __init__(self, key_cache: GoogleKeyCache, token_cache: VerifiedTokenCache):
+        self.key_cache = key_cache
+        self.token_cache = token_cache
+
+    async def verify(self, token: str, audience: str) -> dict:
+        idinfo = self.token_cache.get(token)
+        if idinfo is not None:
+            if idinfo.get("aud") != audience:
+                raise ValueError("Token has wrong audience")
+            return idinfo
+
+        kid = jwt.decode_header(token).get("kid")
+        certs = await self.key_cache.get_certs(kid)
+        idinfo = await asyncio.to_thread(
+            jwt.decode, token, certs=certs, audience=audience
+        )
+
+        if idinfo.get("iss") not in GOOGLE_ISSUERS:
+            raise ValueError("Wrong issuer.")
+
+        self.token_cache.put(token, idinfo)
+        return idinfo
+
+
+verifier = GoogleTokenVerifier(
+    GoogleKeyCache(),
+    VerifiedTokenCache(maxsize=int(os.getenv("TOKEN_CACHE_SIZE", "4096"))),
+)
+
+
+def set_key_fetcher(fetcher: KeyFetcher):
+    """공개키 조회 함수 교체 (테스트/벤치마크에서 로컬 키 사용)"""
+    verifier.key_cache.fetcher = fetcher
+    verifier.key_cache.clear()
+    verifier.token_cache.clear()
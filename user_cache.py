@@ -0,0 +1,96 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from database import User
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def snapshot(user: User) -> User:
+    """DB 세션과 분리된 User 복사본"""
+    return User(**{c.key: getattr(user, c.key) for c in User.__table__.columns})
+
+
+class UserCache:
+    """인증된 유저 캐시 (Google sub/email 키, TTL + 최대 크기 제한)
+
+    DB 세션과 분리된 User 스냅샷을 돌려주므로 캐시 히트 시 DB를 조회하지 않는다.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[int, Tuple[float, dict]]" = OrderedDict()
+        self._aliases: Dict[str, int] = {}
+
+    def get(self, google_id: Optional[str], email: Optional[str]) -> Optional[User]:
+        aliases = [f"sub:{google_id}", f"email:{email}"] if google_id else [f"email:{email}"]
+        for alias in aliases:
+            user_id = self._aliases.get(alias)
+            if user_id is None:
+                continue
+            entry = self._entries.get(user_id)
+            if entry is None:
+                continue
+            expires_at, values = entry
+            if expires_at <= time.monotonic():
+                self.invalidate(user_id, count=False)
+                break
+            if values["email"] != email:
+                continue
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return User(**values)
+
+        self.misses += 1
+        return None
+
+    def put(self, user: User):
+        values = {c.key: getattr(user, c.key) for c in User.__table__.columns}
+        self.invalidate(user.id, count=False)
+        self._entries[user.id] = (time.monotonic() + self.ttl, values)
+        self._aliases[f"email:{user.email}"] = user.id
+        if user.google_id:
+            self._aliases[f"sub:{user.google_id}"] = user.id
+        while len(self._entries) > self.maxsize:
+            oldest_id, (_, values) = self._entries.popitem(last=False)
+            self._drop_aliases(oldest_id, values)
+
+    def invalidate(self, user_id: int, count: bool = True):
+        """유저 캐시 무효화 (역할 변경 등)"""
+        entry = self._entries.pop(user_id, None)
+        if entry is None:
+            return
+        self._drop_aliases(user_id, entry[1])
+        if count:
+            self.invalidations += 1
+
+    def _drop_aliases(self, user_id: int, values: dict):
+        for alias in (f"email:{values['email']}", f"sub:{values['google_id']}"):
+            if self._aliases.get(alias) == user_id:
+                del self._aliases[alias]
+
+    def clear(self):
+        self._entries.clear()
+        self._aliases.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+user_cache = UserCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "60")),
+)